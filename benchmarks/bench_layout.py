@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+
+"""
+Расчет и применение раскладки на MemoryWindowManager, без рабочего стола.
+
+    python benchmarks/bench_layout.py --sizes 10 100 1000 --latency 0.001 --output layout.json
+"""
+
+import argparse
+import math
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from screen_god import Item, set_backend
+from screen_god.composite import engine
+from screen_god.manager.MemoryWindowManager import MemoryWindowManager
+
+from common import grid, measure, report, summary
+
+
+def run(size, repeat, latency):
+    manager = MemoryWindowManager(latency=latency, auto_map=False)
+    set_backend(manager)
+
+    timings = {'build': [], 'solve': [], 'grid_engine': [], 'apply': [], 'relayout': []}
+    columns = max(1, math.ceil(math.sqrt(size)))
+    rows = math.ceil(size / columns)
+
+    for _ in range(repeat):
+        hwnds = [manager.create_window(title='window {}'.format(i)) for i in range(size)]
+
+        (root, _), elapsed = measure(lambda: grid(size, factory=lambda i: Item(wnd=hwnds[i])))
+        timings['build'].append(elapsed)
+
+        _, elapsed = measure(root.plan)
+        timings['solve'].append(elapsed)
+
+        # Та же сетка, рассчитанная пакетно без дерева элементов.
+        _, elapsed = measure(lambda: engine.plan(hwnds, engine.grid((0, 0, 1920, 1080), rows, columns)))
+        timings['grid_engine'].append(elapsed)
+
+        manager.metrics().reset()
+
+        _, elapsed = measure(root.move)
+        timings['apply'].append(elapsed)
+
+        # Количество обращений к менеджеру за одно применение раскладки.
+        calls = sum(h['count'] for h in manager.metrics().snapshot()['latency'].values())
+
+        # Окна уже на своих местах, поэтому повторное применение ничего не перемещает.
+        skipped, elapsed = measure(root.move)
+        timings['relayout'].append(elapsed)
+
+        for hwnd in hwnds:
+            manager.close(hwnd)
+
+    result = {name: summary(values) for name, values in timings.items()}
+    result['windows'] = size
+    result['latency'] = latency
+    result['backend_calls'] = calls
+    result['skipped'] = skipped
+
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--latency', type=float, default=0, help='задержка каждой операции менеджера, с')
+    parser.add_argument('--output', help='файл для результатов в JSON')
+    args = parser.parse_args()
+
+    report('layout', [run(size, args.repeat, args.latency) for size in args.sizes], args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+
+"""
+Сквозной бенчмарк настоящих Linux-менеджеров на Xvfb с легким EWMH-совместимым
+оконным менеджером (по умолчанию openbox) и простыми X-клиентами.
+Измеряет время от запуска до размещения окон и время повторного размещения.
+
+    python benchmarks/bench_xvfb.py --sizes 4 16 --backends xlib wmctrl --output xvfb.json
+
+Требуются Xvfb, оконный менеджер, python-xlib, а для менеджера wmctrl - wmctrl, xprop, xwininfo.
+"""
+
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+from time import monotonic, sleep
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from screen_god import LauncherItem, set_backend
+
+from common import grid, measure, report, summary
+
+
+DUMMY_CLIENT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'dummy_client.py')
+
+
+def free_display():
+    for number in range(99, 200):
+        if not os.path.exists('/tmp/.X11-unix/X{}'.format(number)):
+            return number
+
+    raise RuntimeError('No free X display found.')
+
+
+def wait_for(predicate, timeout, message):
+    deadline = monotonic() + timeout
+
+    while not predicate():
+        if monotonic() > deadline:
+            raise RuntimeError(message)
+        sleep(0.05)
+
+
+def wm_ready():
+    """Проверяет, что оконный менеджер выставил _NET_SUPPORTING_WM_CHECK."""
+    from Xlib.display import Display
+
+    display = Display()
+
+    try:
+        atom = display.intern_atom('_NET_SUPPORTING_WM_CHECK')
+        return display.screen().root.get_full_property(atom, 0) is not None
+    finally:
+        display.close()
+
+
+def start_desktop(wm, width, height):
+    """Запускает Xvfb и оконный менеджер, возвращает список их процессов."""
+    number = free_display()
+    os.environ['DISPLAY'] = ':{}'.format(number)
+
+    xvfb = subprocess.Popen(['Xvfb', ':{}'.format(number), '-screen', '0', '{}x{}x24'.format(width, height)],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    wait_for(lambda: os.path.exists('/tmp/.X11-unix/X{}'.format(number)), 10, 'Xvfb did not start.')
+
+    manager = subprocess.Popen(wm.split(), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    wait_for(wm_ready, 10, 'Window manager did not start.')
+
+    return [manager, xvfb]
+
+
+def run(backend, size, repeat, width, height, timeout):
+    set_backend(backend)
+
+    timings = {'launch': [], 'relayout': []}
+
+    for _ in range(repeat):
+        def factory(i):
+            return LauncherItem(cmd=[sys.executable, DUMMY_CLIENT, 'dummy {}'.format(i)])
+
+        root, _ = grid(size, width, height, factory)
+
+        _, elapsed = measure(lambda: root.execute_all(timeout=timeout))
+        timings['launch'].append(elapsed)
+
+        _, elapsed = measure(root.move)
+        timings['relayout'].append(elapsed)
+
+        root.close()
+
+    result = {name: summary(values) for name, values in timings.items()}
+    result['backend'] = backend
+    result['windows'] = size
+
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[4, 16])
+    parser.add_argument('--backends', nargs='+', default=['xlib', 'wmctrl'])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--wm', default='openbox --sm-disable', help='команда оконного менеджера')
+    parser.add_argument('--geometry', default='1920x1080', help='размер экрана Xvfb')
+    parser.add_argument('--timeout', type=float, default=10, help='ожидание окон, с')
+    parser.add_argument('--output', help='файл для результатов в JSON')
+    args = parser.parse_args()
+
+    for program in ('Xvfb', args.wm.split()[0]):
+        if shutil.which(program) is None:
+            parser.exit(2, '{} is not installed.\n'.format(program))
+
+    width, height = (int(v) for v in args.geometry.split('x'))
+    processes = start_desktop(args.wm, width, height)
+
+    try:
+        results = [
+            run(backend, size, args.repeat, width, height, args.timeout)
+            for backend in args.backends
+            for size in args.sizes
+        ]
+    finally:
+        for proc in processes:
+            proc.terminate()
+            proc.wait()
+
+    report('xvfb', results, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+
+import json
+import math
+import platform
+import statistics
+import sys
+from time import perf_counter, time
+
+from screen_god import Layout
+
+
+def grid(n, width=1920, height=1080, factory=None):
+    """
+    Строит сетку из n элементов: вертикальный слой из строк-горизонтальных слоев.
+    factory(i) возвращает i-й элемент сетки. Возвращает корневой слой и список элементов.
+    """
+    columns = max(1, math.ceil(math.sqrt(n)))
+    root = Layout(Layout.VERTICAL, x=0, y=0, width=width, height=height)
+    items = []
+
+    while len(items) < n:
+        row = Layout(Layout.HORIZONTAL)
+        root.append(row)
+
+        for _ in range(min(columns, n - len(items))):
+            item = factory(len(items))
+            row.append(item)
+            items.append(item)
+
+    return root, items
+
+
+def measure(func):
+    """Выполняет func и возвращает (результат, время в секундах)."""
+    start = perf_counter()
+    result = func()
+    return result, perf_counter() - start
+
+
+def summary(values):
+    return {
+        'min': min(values),
+        'median': statistics.median(values),
+        'max': max(values),
+        'runs': len(values),
+    }
+
+
+def report(name, results, output=None):
+    """Выводит результаты в JSON, пригодном для сравнения между версиями."""
+    data = {
+        'benchmark': name,
+        'time': time(),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'results': results,
+    }
+
+    text = json.dumps(data, indent=2, sort_keys=True)
+
+    if output:
+        with open(output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
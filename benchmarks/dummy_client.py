@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+
+"""Простейший X-клиент для бенчмарков: открывает одно окно и ждет завершения."""
+
+import os
+import sys
+
+from Xlib import X, Xatom
+from Xlib.display import Display
+
+
+def main():
+    title = sys.argv[1] if len(sys.argv) > 1 else 'screen-god dummy'
+
+    display = Display()
+    screen = display.screen()
+
+    window = screen.root.create_window(
+        0, 0, 320, 240, 0, screen.root_depth,
+        X.InputOutput, X.CopyFromParent,
+        background_pixel=screen.white_pixel,
+        event_mask=X.StructureNotifyMask
+    )
+
+    window.set_wm_name(title)
+    window.set_wm_class('dummy', 'ScreenGodDummy')
+    window.change_property(display.intern_atom('_NET_WM_NAME'), display.intern_atom('UTF8_STRING'), 8,
+                           title.encode('utf-8'))
+    window.change_property(display.intern_atom('_NET_WM_PID'), Xatom.CARDINAL, 32, [os.getpid()])
+    window.map()
+    display.flush()
+
+    while True:
+        ev = display.next_event()
+
+        if ev.type == X.DestroyNotify:
+            return
+
+
+if __name__ == '__main__':
+    main()
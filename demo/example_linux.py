@@ -5,9 +5,9 @@ import time
 from screen_god import LauncherItem, Layout
 
 
-designer = LauncherItem()
-vlc = LauncherItem()
-iceweasel = LauncherItem()
+designer = LauncherItem(cmd=['designer'])
+vlc = LauncherItem(cmd=['vlc'])
+iceweasel = LauncherItem(cmd=['iceweasel', '--private-window'])
 
 layout = Layout(direction=Layout.HORIZONTAL)
 layout.append(designer)
@@ -17,11 +17,8 @@ main_layout = Layout(direction=Layout.VERTICAL, x=10, y=50, width=1400, height=9
 main_layout.append(layout)
 main_layout.append(iceweasel)
 
-designer.execute(['designer'])
-vlc.execute(['vlc'])
-iceweasel.execute(['iceweasel', '--private-window'])
-
-main_layout.move()
+# Все приложения запускаются одновременно, окна размещаются по мере появления.
+main_layout.execute_all(move_each=True)
 
 time.sleep(3)
 
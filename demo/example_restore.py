@@ -0,0 +1,15 @@
+# -*- coding: utf-8 -*-
+
+import os
+import time
+
+from screen_god.composite.loader import restore
+
+
+# При повторном запуске план размещения берется из кэша без расчета раскладки.
+workspace = restore(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'layout_linux.json'))
+workspace.execute_all(move_each=True)
+
+time.sleep(3)
+
+workspace.close()
@@ -5,10 +5,10 @@ import time
 from screen_god import LauncherItem, Layout
 
 
-notepad = LauncherItem()
-regedit = LauncherItem()
-explorer = LauncherItem()
-paint = LauncherItem()
+notepad = LauncherItem(cmd=['notepad'])
+regedit = LauncherItem(cmd=['regedit'])
+explorer = LauncherItem(cmd=['explorer'])
+paint = LauncherItem(cmd=['%SystemRoot%\system32\mspaint.exe'], shell=True)
 
 layout = Layout(direction=Layout.HORIZONTAL)
 layout.append(notepad)
@@ -19,12 +19,7 @@ main_layout.append(explorer)
 main_layout.append(layout)
 main_layout.append(paint)
 
-notepad.execute(['notepad'])
-regedit.execute(['regedit'])
-explorer.execute(['explorer'])
-paint.execute(['%SystemRoot%\system32\mspaint.exe'], shell=True)
-
-main_layout.move()
+main_layout.execute_all()
 
 time.sleep(3)
 
@@ -2,5 +2,5 @@
 
 from screen_god.common import run_command
 from screen_god.messages import t
-from screen_god.manager import WindowManager
-from screen_god.composite import AbstractItem, Item, LauncherItem, Layout
+from screen_god.manager import MoveScheduler, WindowManager, get_backend, set_backend
+from screen_god.composite import AbstractItem, Enforcer, GridLayout, InstanceRegistry, Item, LauncherItem, Layout
@@ -0,0 +1,299 @@
+# -*- coding: utf-8 -*-
+
+"""
+Асинхронный интерфейс для использования screen-god внутри цикла событий asyncio.
+
+Чтение вывода и завершение процессов выполняются в цикле событий, а обращения
+к менеджеру окон, включая ожидание его событий, - по очереди в отдельном потоке.
+Обработчики вывода, как и в синхронном интерфейсе, вызывает диспетчер screen_god.output.
+"""
+
+import asyncio
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from time import monotonic
+
+import psutil
+
+from screen_god.composite import base, items
+from screen_god.manager import NoSuchWindowException
+from screen_god.manager.WindowManager import Launch, terminate
+from screen_god.messages import t
+from screen_god.output import CHUNK_SIZE, LineSplitter
+
+
+# Наибольшее время в секундах, на которое ожидание событий занимает поток менеджера.
+WAIT_SLICE = 0.1
+
+
+async def maybe_await(result):
+    if asyncio.iscoroutine(result):
+        return await result
+
+    return result
+
+
+async def spawn(cargs, shell=False, **kwargs):
+    """Запускает процесс средствами asyncio, возвращает asyncio.subprocess.Process."""
+    if shell:
+        cmd = cargs if isinstance(cargs, str) else subprocess.list2cmdline(cargs)
+        return await asyncio.create_subprocess_shell(cmd, **kwargs)
+
+    return await asyncio.create_subprocess_exec(*cargs, **kwargs)
+
+
+class AsyncWindowManager(object):
+    """
+    Асинхронная обертка над менеджером окон.
+    Методы менеджера, не переопределенные здесь, доступны как корутины:
+    await WindowManager.geometry(hwnd).
+    """
+
+    def __init__(self, manager=None):
+        self.__manager = manager
+        self.__executor = ThreadPoolExecutor(max_workers=1)
+
+    def __getattr__(self, name):
+        method = getattr(self.manager(), name)
+
+        async def call(*args, **kwargs):
+            return await self.run(method, *args, **kwargs)
+
+        return call
+
+    async def __wait_opened(self, watcher, timeout):
+        """
+        Ждет изменения списка окон, не блокируя цикл событий.
+        События читаются только в потоке менеджера, который занят ожиданием не дольше WAIT_SLICE секунд.
+        """
+        if watcher.fileno() is None:
+            await asyncio.sleep(max(0, min(timeout, watcher.poll_interval)))
+            return False
+
+        return await self.run(watcher.wait, max(0, min(timeout, WAIT_SLICE)))
+
+    def manager(self):
+        if self.__manager is None:
+            from screen_god.manager import WindowManager
+            return WindowManager
+
+        return self.__manager
+
+    async def move(self, hwnd, x, y, width, height):
+        await self.run(self.manager().move, hwnd, x, y, width, height)
+
+    async def move_changed(self, geometry, tolerance=0):
+        return await self.run(self.manager().move_changed, list(geometry), tolerance)
+
+    async def move_many(self, geometry):
+        await self.run(self.manager().move_many, list(geometry))
+
+    async def popen(self, cargs, timeout=5, shell=False, **kwargs):
+        """Асинхронный аналог WindowManager.Popen(), proc - asyncio.subprocess.Process."""
+        kwargs['shell'] = shell
+        hwnd, proc = (await self.popen_many([(cargs, kwargs)], timeout))[0]
+
+        if hwnd is None:
+            raise NoSuchWindowException(t('started_process_without_gui'))
+
+        return hwnd, proc
+
+    async def popen_many(self, commands, timeout=5, callback=None):
+        """
+        Асинхронный аналог WindowManager.Popen_many().
+        callback может быть обычной функцией или корутиной.
+        """
+        manager = self.manager()
+        watcher = await self.run(manager.watch_opened)
+
+        try:
+            opened = set(await self.run(manager.get_opened))
+            procs = []
+            launches = []
+
+            try:
+                for cargs, kwargs in commands:
+                    kwargs = dict(kwargs)
+                    shell = kwargs.pop('shell', False)
+                    proc = await spawn(cargs, shell, **kwargs)
+
+                    procs.append(proc)
+                    launches.append(Launch(psutil.Process(proc.pid), shell))
+            except BaseException:
+                # Как и WindowManager.Popen_many(), не оставляем запущенные процессы без владельца.
+                await self.run(terminate, [launch.proc for launch in launches])
+                raise
+
+            results = [(None, proc) for proc in procs]
+            pending = list(range(len(launches)))
+            deadline = monotonic() + timeout
+
+            while pending:
+                found = await self.run(manager.match_opened, opened, launches, pending)
+
+                for i, hwnd, own in found:
+                    results[i] = (hwnd, procs[i] if own else None)
+
+                    if callback:
+                        await maybe_await(callback(i, *results[i]))
+
+                remaining = deadline - monotonic()
+
+                if not pending or remaining <= 0:
+                    break
+
+                await self.__wait_opened(watcher, remaining)
+        finally:
+            await self.run(watcher.close)
+
+        return results
+
+    async def run(self, func, *args, **kwargs):
+        """Выполняет блокирующий вызов менеджера в его потоке."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.__executor, partial(func, *args, **kwargs))
+
+
+WindowManager = AsyncWindowManager()
+
+
+class Item(items.Item):
+    __slots__ = ()
+
+    async def close(self):
+        await WindowManager.close(self.hwnd())
+
+    async def move(self, tolerance=0):
+        return await WindowManager.move_changed(self.plan(), tolerance)
+
+
+class LauncherItem(items.LauncherItem):
+    """LauncherItem, процесс которого запускается и читается средствами asyncio."""
+
+    __slots__ = ('__tasks',)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.__tasks = []
+
+    async def close(self, timeout=5):
+        """Завершает процесс и его потомков, через timeout секунд процесс убивается."""
+        proc = self.process()
+        hwnd = self.hwnd()
+
+        if proc and proc.returncode is None:
+            try:
+                children = psutil.Process(proc.pid).children(recursive=True)
+            except psutil.Error:
+                children = []
+
+            for child in children:
+                try:
+                    child.terminate()
+                except psutil.Error:
+                    pass
+
+            proc.terminate()
+
+            try:
+                await asyncio.wait_for(proc.wait(), timeout)
+            except asyncio.TimeoutError:
+                proc.kill()
+                await proc.wait()
+
+        if hwnd and await WindowManager.is_exists(hwnd):
+            await WindowManager.close(hwnd)
+
+        for task in self.__tasks:
+            task.cancel()
+
+        self.__tasks = []
+        self.attach(None, None)
+
+    async def execute(self, cmd=None, timeout=5, **kwargs):
+        if self.process():
+            return
+
+        cmd, kwargs = self.command(cmd, **kwargs)
+
+        if cmd is None:
+            raise ValueError(t('invalid_argument_value', name='cmd'))
+
+        self.attach(*await WindowManager.popen(cmd, timeout, **kwargs))
+        await self.move()
+
+    def listen(self):
+        proc = self.process()
+
+        for name, factory in zip(('stdout', 'stderr'), self.handlers()):
+            stream, capture = getattr(proc, name), self.capture(name)
+
+            if stream is not None and (factory or capture):
+                queue = self.queue(factory() if factory else None)
+                self.__tasks.append(asyncio.ensure_future(self.reader(stream, queue, capture)))
+
+    async def move(self, tolerance=0):
+        return await WindowManager.move_changed(self.plan(), tolerance)
+
+    async def reader(self, stream, queue, capture=None):
+        """
+        Читает канал фрагментами, строки любой длины передаются в очередь HandlerQueue,
+        обработчик вызывается диспетчером, а не в цикле событий.
+        """
+        splitter = LineSplitter()
+
+        try:
+            while True:
+                chunk = await stream.read(CHUNK_SIZE)
+
+                if not chunk:
+                    break
+
+                if capture is not None:
+                    capture.write(chunk)
+
+                if queue is not None and not queue.put(splitter.feed(chunk)):
+                    # Обработчик не успевает: процесс подождет, пока в очереди не освободится место.
+                    await asyncio.get_running_loop().run_in_executor(None, queue.wait_space)
+
+            if queue is not None:
+                queue.put(splitter.flush())
+        finally:
+            if queue is not None:
+                queue.close()
+
+
+class Layout(base.Layout):
+    __slots__ = ()
+
+    async def close(self):
+        """Закрывает все элементы одновременно."""
+        await asyncio.gather(*[maybe_await(item.close()) for item in self])
+
+    async def execute_all(self, timeout=5, move_each=False):
+        """Асинхронный аналог Layout.execute_all() для элементов LauncherItem из этого модуля."""
+        launchers = self.launchers()
+        commands = [item.command() for item in launchers]
+        results = await WindowManager.popen_many(commands, timeout, base.on_found(launchers, move_each))
+
+        if not move_each:
+            await self.move()
+
+        base.attach_missing(launchers, results)
+
+    async def move(self, tolerance=0):
+        return await WindowManager.move_changed(self.plan(), tolerance)
+
+    async def relayout(self, tolerance=0):
+        return await WindowManager.move_changed(self.update_plan(), tolerance)
+
+    async def schedule(self, scheduler):
+        """Ждет пакета MoveScheduler с изменившимися окнами, не блокируя цикл событий."""
+        return await asyncio.wrap_future(super().schedule(scheduler))
+
+
+class GridLayout(base.GridLayout, Layout):
+    """GridLayout с асинхронными close(), execute_all(), move() и relayout()."""
+
+    __slots__ = ()
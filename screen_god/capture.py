@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+
+"""
+Сохранение последнего вывода процесса.
+
+RingBuffer хранит последние capacity байтов потока в буфере, выделенном заранее,
+поэтому расход памяти не зависит от объема вывода. Вытесненные из буфера байты
+можно сохранять на диск в сегменты, отображенные в память (SpillSegments):
+заполненный сегмент закрывается, создается новый, а самые старые удаляются.
+"""
+
+import mmap
+import os
+import tempfile
+import weakref
+from threading import Lock
+
+
+def remove_files(paths):
+    for path in paths:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+class RingBuffer(object):
+    """
+    Последние capacity байтов потока. spill - SpillSegments для вытесненных байтов или None.
+    С encoding строки tail() декодируются.
+    """
+
+    def __init__(self, capacity, spill=None, encoding=None):
+        if capacity <= 0:
+            raise ValueError('capacity')
+
+        self.encoding = encoding
+
+        self.__buffer = bytearray(capacity)
+        self.__capacity = capacity
+        self.__start = 0
+        self.__size = 0
+        self.__written = 0
+        self.__spill = spill
+        self.__lock = Lock()
+
+    def __read(self, start, size):
+        """Возвращает size байтов буфера, начиная с логической позиции start."""
+        begin = (self.__start + start) % self.__capacity
+        end = begin + size
+
+        if end <= self.__capacity:
+            return bytes(self.__buffer[begin:end])
+
+        return bytes(self.__buffer[begin:]) + bytes(self.__buffer[:end - self.__capacity])
+
+    def __write(self, data):
+        """Записывает не больше capacity байтов после последнего байта буфера."""
+        begin = (self.__start + self.__size) % self.__capacity
+        first = min(len(data), self.__capacity - begin)
+
+        self.__buffer[begin:begin + first] = data[:first]
+        self.__buffer[:len(data) - first] = data[first:]
+
+    def capacity(self):
+        return self.__capacity
+
+    def close(self):
+        """Удаляет сегменты на диске."""
+        if self.__spill is not None:
+            self.__spill.close()
+
+    def getvalue(self):
+        """Содержимое буфера - последние capacity байтов потока."""
+        with self.__lock:
+            return self.__read(0, self.__size)
+
+    def size(self):
+        return self.__size
+
+    def tail(self, n=10):
+        """Возвращает последние n строк потока, включая сохраненные на диске."""
+        with self.__lock:
+            data = self.__read(0, self.__size)
+            segments = self.__spill.segments() if self.__spill is not None else []
+
+        # Сегменты читаются с конца, пока не наберется достаточно строк.
+        while segments and data.count(b'\n') <= n:
+            data = segments.pop() + data
+
+        lines = data.split(b'\n')
+
+        if lines and not lines[-1]:
+            lines.pop()
+
+        lines = [line.rstrip() for line in lines[-n:]] if n > 0 else []
+
+        if self.encoding:
+            return [line.decode(self.encoding, 'replace') for line in lines]
+
+        return lines
+
+    def write(self, data):
+        with self.__lock:
+            self.__written += len(data)
+
+            if len(data) > self.__capacity:
+                if self.__spill is not None:
+                    self.__spill.write(self.__read(0, self.__size))
+                    self.__spill.write(data[:len(data) - self.__capacity])
+
+                data = data[len(data) - self.__capacity:]
+                self.__start, self.__size = 0, 0
+
+            overflow = self.__size + len(data) - self.__capacity
+
+            if overflow > 0:
+                if self.__spill is not None:
+                    self.__spill.write(self.__read(0, overflow))
+
+                self.__start = (self.__start + overflow) % self.__capacity
+                self.__size -= overflow
+
+            self.__write(data)
+            self.__size += len(data)
+
+    def written(self):
+        """Сколько байтов записано в буфер всего."""
+        return self.__written
+
+
+class SpillSegments(object):
+    """
+    Файлы-сегменты размером segment_size в каталоге directory, отображенные в память.
+    Хранится не больше count сегментов, при заполнении нового сегмента самый старый удаляется.
+    Файлы удаляются в close() или при сборке объекта.
+    """
+
+    def __init__(self, directory=None, segment_size=1 << 20, count=4, prefix='screen-god-'):
+        self.directory = directory
+        self.segment_size = segment_size
+        self.count = count
+        self.prefix = prefix
+
+        # Закрытые сегменты: пути и количество записанных байтов.
+        self.__closed = []
+        self.__paths = []
+        self.__path = None
+        self.__map = None
+        self.__used = 0
+        self.__finalizer = weakref.finalize(self, remove_files, self.__paths)
+
+    def __open(self):
+        fd, path = tempfile.mkstemp(prefix=self.prefix, suffix='.seg', dir=self.directory)
+
+        try:
+            os.ftruncate(fd, self.segment_size)
+            self.__map = mmap.mmap(fd, self.segment_size)
+        finally:
+            os.close(fd)
+
+        self.__path = path
+        self.__paths.append(path)
+        self.__used = 0
+
+    def __rotate(self):
+        """Закрывает заполненный сегмент и удаляет лишние старые."""
+        self.__map.close()
+        self.__closed.append((self.__path, self.__used))
+        self.__map = None
+
+        while len(self.__closed) >= self.count:
+            path, _ = self.__closed.pop(0)
+            self.__paths.remove(path)
+            remove_files([path])
+
+    def close(self):
+        if self.__map is not None:
+            self.__map.close()
+            self.__map = None
+
+        self.__closed = []
+        self.__finalizer()
+
+    def paths(self):
+        return list(self.__paths)
+
+    def segments(self):
+        """Содержимое сегментов от старого к новому."""
+        data = []
+
+        for path, used in self.__closed:
+            try:
+                with open(path, 'rb') as f:
+                    data.append(f.read(used))
+            except OSError:
+                continue
+
+        if self.__map is not None:
+            data.append(self.__map[:self.__used])
+
+        return data
+
+    def write(self, data):
+        while data:
+            if self.__map is None:
+                self.__open()
+
+            size = min(len(data), self.segment_size - self.__used)
+            self.__map[self.__used:self.__used + size] = data[:size]
+            self.__used += size
+            data = data[size:]
+
+            if self.__used == self.segment_size:
+                self.__rotate()
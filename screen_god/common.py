@@ -2,9 +2,80 @@
 
 import subprocess
 
+from screen_god.output import Dispatcher, HandlerQueue, Reactor
 
-def run_command(cmd):
-    p = subprocess.Popen(cmd, stdout=subprocess.PIPE, shell=True)
-    output, err = p.communicate()
-    status = p.wait()
-    return output.strip().decode('utf-8'), err, status
+
+# Время в секундах, после которого зависшая команда завершается принудительно.
+COMMAND_TIMEOUT = 5
+
+
+def run_command(cmd, timeout=None):
+    """
+    Выполняет команду и возвращает (output, err, status).
+    Список аргументов запускается напрямую, без оболочки; строка выполняется
+    оболочкой, как и раньше. По истечении timeout секунд процесс завершается,
+    а status равен None.
+    """
+    shell = isinstance(cmd, str)
+
+    try:
+        p = subprocess.Popen(
+            cmd,
+            stdout=subprocess.PIPE,
+            stderr=None if shell else subprocess.PIPE,
+            shell=shell
+        )
+    except OSError as e:
+        return '', str(e), 127
+
+    try:
+        output, err = p.communicate(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        p.kill()
+        p.communicate()
+        return '', 'Timeout expired', None
+
+    if err is not None:
+        err = err.strip().decode('utf-8', 'replace')
+
+    return output.strip().decode('utf-8', 'replace'), err, p.returncode
+
+
+class HelperProcess(object):
+    """
+    Долгоживущий вспомогательный процесс, например, xprop -spy.
+    Вывод всех вспомогательных процессов читает общий поток ввода-вывода (screen_god.output.Reactor),
+    строки передаются в on_line(line) потоком отдельного диспетчера (screen_god.output.Dispatcher.internal()),
+    после завершения процесса вызывается on_exit().
+    """
+
+    def __init__(self, args, on_line, on_exit=None):
+        self.__on_line = on_line
+        self.__on_exit = on_exit
+
+        self.__proc = subprocess.Popen(
+            args,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            universal_newlines=True
+        )
+
+        queue = HandlerQueue(self, dispatcher=Dispatcher.internal())
+        queue.set_on_done(self.__exited)
+        Reactor.default().add(self.__proc.stdout, queue)
+
+    def __exited(self):
+        self.__proc.wait()
+
+        if self.__on_exit:
+            self.__on_exit()
+
+    def close(self):
+        if self.is_alive():
+            self.__proc.terminate()
+
+    def execute(self, line):
+        self.__on_line(line)
+
+    def is_alive(self):
+        return self.__proc.poll() is None
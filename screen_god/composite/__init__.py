@@ -1,4 +1,6 @@
 # -*- coding: utf-8 -*-
 
-from screen_god.composite.base import AbstractItem, Layout
+from screen_god.composite.base import AbstractItem, GridLayout, Layout
+from screen_god.composite.enforcer import Enforcer
 from screen_god.composite.items import Item, LauncherItem
+from screen_god.composite.registry import InstanceRegistry
@@ -1,32 +1,71 @@
 # -*- coding: utf-8 -*-
 
+from math import ceil
+
+from screen_god.composite.engine import grid
+from screen_god.composite.registry import InstanceRegistry
+from screen_god.composite.solver import HORIZONTAL, VERTICAL, parse_size, place, solve
+from screen_god.manager import NoSuchWindowException, WindowManager
 from screen_god.messages import t
 
 
 DEBUG_STR = '{:>12}: {}'
 
 
-class AbstractItem(object):
-    __instances = {}
+def attach_missing(launchers, results):
+    """
+    Привязывает процессы, окна которых не появились, к их LauncherItem, чтобы их можно было
+    завершить через close(), и сообщает об этом исключением NoSuchWindowException.
+    """
+    missing = [i for i, (hwnd, _) in enumerate(results) if hwnd is None]
 
-    def __get_item_size(self, base_size):
-        value, unit = self.size()
+    for i in missing:
+        launchers[i].attach(*results[i])
+
+    if missing:
+        raise NoSuchWindowException(t('started_process_without_gui'))
+
+
+def execute_launchers(owner, timeout=5, move_each=False):
+    """Запускает LauncherItem из owner.launchers() и размещает их окна, см. Layout.execute_all()."""
+    launchers = owner.launchers()
+    commands = [item.command() for item in launchers]
+    results = WindowManager.Popen_many(commands, timeout, on_found(launchers, move_each))
+
+    if not move_each:
+        owner.move()
+
+    attach_missing(launchers, results)
 
-        if unit is None:
-            item_count = self.layout().item_count()
-            return int(value * base_size / item_count)
 
-        if unit == '%':
-            return int(value * base_size / 100)
+def on_found(launchers, move_each=False):
+    """
+    Возвращает callback(i, hwnd, proc) для Popen_many(), привязывающий окно к i-му LauncherItem.
+    С move_each=True окно сразу размещается, callback возвращает результат move().
+    """
+    def found(i, hwnd, proc):
+        launchers[i].attach(hwnd, proc)
 
-        if unit == 'px':
-            return value
+        if move_each:
+            return launchers[i].move()
+
+    return found
+
+
+class AbstractItem(object):
+    __slots__ = ('__layout', '__position', '__size', '__x', '__y', '__width', '__height', '__weakref__')
+    __instances = InstanceRegistry()
+
+    def __resolve(self, force):
+        """Пересчитывает измененную часть дерева, в которое входит элемент, или все дерево с force=True."""
+        if self.__layout is not None:
+            root = self.root()
+            root.solve() if force else root.update()
 
     def __init__(self, size=1):
         self.__layout = None
-        self.__next = None
-        self.__prev = None
-        self.__size = size
+        self.__position = None
+        self.__size = parse_size(size)
         self.__x = None
         self.__y = None
         self.__width = None
@@ -48,71 +87,111 @@ class AbstractItem(object):
 
     @classmethod
     def get_instance(cls, uid, *args, **kwargs):
-        item = cls.__instances.get(uid)
+        return cls.__instances.get_or_create(uid, lambda: cls(*args, **kwargs))
 
-        if item is None:
-            item = cls(*args, **kwargs)
-            cls.__instances[uid] = item
-
-        return item
+    def geometry(self):
+        """Возвращает рассчитанную геометрию (x, y, width, height) без пересчета."""
+        return self.__x, self.__y, self.__width, self.__height
 
     def height(self, force=False):
-        if not force and self.__height:
-            return self.__height
-
-        layout = self.layout()
-
-        if layout.direction() == Layout.HORIZONTAL:
-            self.__height = layout.height()
-        else:
-            self.__height = self.__get_item_size(layout.height())
+        self.__resolve(force)
 
         return self.__height
 
+    def launchers(self):
+        """Возвращает элементы, которые можно запустить через Layout.execute_all()."""
+        return []
+
     def layout(self):
         return self.__layout
 
-    def move(self):
+    def move(self, tolerance=0):
         raise NotImplementedError(t('abstract_method', method='Item.move()'))
 
     def next(self):
-        return self.__next
+        layout = self.__layout
+
+        if layout is not None:
+            i = self.__position + 1
+            return layout[i] if i < len(layout) else None
+
+    def plan(self):
+        """Возвращает список (hwnd, x, y, width, height) для всех окон элемента."""
+        raise NotImplementedError(t('abstract_method', method='Item.plan()'))
 
     def prev(self):
-        return self.__prev
+        layout = self.__layout
+
+        if layout is not None:
+            i = self.__position
+            return layout[i - 1] if i > 0 else None
+
+    def position(self):
+        """Позиция элемента в слое или None, если элемент не добавлен в слой."""
+        return self.__position
+
+    def rect(self, force=False):
+        """Возвращает геометрию (x, y, width, height), пересчитав ее при необходимости."""
+        self.__resolve(force)
+        return self.__x, self.__y, self.__width, self.__height
+
+    @staticmethod
+    def registry():
+        """Реестр элементов get_instance(): release(uid), clear(), size() и metrics()."""
+        return AbstractItem.__instances
+
+    @staticmethod
+    def release_instance(uid):
+        """Удаляет элемент uid из реестра get_instance() и возвращает его."""
+        return AbstractItem.__instances.release(uid)
 
     def reset(self):
         self.__layout = None
-        self.__next = None
-        self.__prev = None
+        self.__position = None
         self.__x = None
         self.__y = None
         self.__width = None
         self.__height = None
 
+    def root(self):
+        """Возвращает корневой слой дерева, в которое входит элемент."""
+        root = self
+
+        while root.layout() is not None:
+            root = root.layout()
+
+        return root
+
+    def set_geometry(self, x, y, width, height):
+        """Запоминает геометрию, рассчитанную для элемента слоем."""
+        self.__x = x
+        self.__y = y
+        self.__width = width
+        self.__height = height
+
     def set_height(self, height):
         if self.layout() is not None:
             raise RuntimeError('Use the Item.size() method for setting the element size.')
 
         self.__height = int(height)
 
+    @staticmethod
+    def set_registry(registry=None, maxsize=None, weak=False):
+        """
+        Заменяет реестр элементов get_instance(), например, на InstanceRegistry(maxsize=100, weak=True)
+        для долго работающих процессов. Без registry создается новый реестр с параметрами maxsize и weak.
+        """
+        AbstractItem.__instances = registry if registry is not None else InstanceRegistry(maxsize, weak)
+
     def set_layout(self, layout):
         if not isinstance(layout, Layout):
             raise TypeError(t('incompatible_type_argument', name='layout', type='Layout'))
 
         self.__layout = layout
 
-    def set_next(self, item):
-        if item and not isinstance(item, AbstractItem):
-            raise TypeError(t('incompatible_type_argument', name='item', type='AbstractItem'))
-
-        self.__next = item
-
-    def set_prev(self, item):
-        if item and not isinstance(item, AbstractItem):
-            raise TypeError(t('incompatible_type_argument', name='item', type='AbstractItem'))
-
-        self.__prev = item
+    def set_position(self, i):
+        """Запоминает позицию элемента в слое, вызывается слоем при вставке и удалении элементов."""
+        self.__position = i
 
     def set_x(self, x):
         if self.layout() is not None:
@@ -126,6 +205,15 @@ class AbstractItem(object):
 
         self.__y = int(y)
 
+    def set_size(self, size):
+        """Изменяет размер элемента в слое. Пересчитываются только затронутые элементы."""
+        size = parse_size(size)
+
+        if self.__layout is not None:
+            self.__layout.resize_item(self, size)
+
+        self.__size = size
+
     def set_width(self, width):
         if self.layout() is not None:
             raise RuntimeError('Use the Item.size() method for setting the element size.')
@@ -133,74 +221,47 @@ class AbstractItem(object):
         self.__width = int(width)
 
     def size(self):
-        size = self.__size or 1
-
-        if isinstance(size, int):
-            return size, None
-
-        if isinstance(size, str):
-            for i, c in enumerate(size):
-                if not c.isdigit():
-                    break
-
-            return int(size[:i]), size[i:]
-
-        raise ValueError('Unknown unit "{}".'.format(size))
+        return self.__size
 
     def width(self, force=False):
-        if not force and self.__width:
-            return self.__width
-
-        layout = self.layout()
-
-        if layout.direction() == Layout.VERTICAL:
-            self.__width = layout.width()
-        else:
-            self.__width = self.__get_item_size(layout.width())
+        self.__resolve(force)
 
         return self.__width
 
     def x(self, force=False):
-        if not force and self.__x is not None:
-            return self.__x
-
-        layout = self.layout()
-        prev = self.prev()
-
-        if prev is None or layout.direction() == Layout.VERTICAL:
-            self.__x = layout.x()
-            return self.__x
-
-        self.__x = prev.x() + prev.width()
+        self.__resolve(force)
 
         return self.__x
 
     def y(self, force=False):
-        if not force and self.__y is not None:
-            return self.__y
-
-        layout = self.layout()
-        prev = self.prev()
-
-        if prev is None or layout.direction() == Layout.HORIZONTAL:
-            self.__y = layout.y()
-            return self.__y
-
-        self.__y = prev.y() + prev.height()
+        self.__resolve(force)
 
         return self.__y
 
 
 class Layout(AbstractItem):
-    HORIZONTAL = 'horizontal'
-    VERTICAL = 'vertical'
+    __slots__ = (
+        '__direction', '__items', '__flex', '__fixed', '__percents', '__dirty', '__pending', '__solved_rect', '__monitor',
+    )
+
+    HORIZONTAL = HORIZONTAL
+    VERTICAL = VERTICAL
 
     def __init__(self, direction, width=None, height=None, x=None, y=None, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
         self.__direction = direction
-        self.__head = None
-        self.__tail = None
+        self.__items = []
+        # Сумма долей элементов без единиц измерения, размеров в px и количество элементов каждого размера в %.
+        self.__flex = 0
+        self.__fixed = 0
+        self.__percents = {}
+        # Позиция первого элемента, геометрию которого нужно пересчитать, и вложенные слои с изменениями.
+        self.__dirty = None
+        self.__pending = set()
+        self.__solved_rect = None
+        # Имя монитора, к которому привязан слой, и признак использования его рабочей области.
+        self.__monitor = None
 
         if x is not None:
             self.set_x(x)
@@ -214,34 +275,47 @@ class Layout(AbstractItem):
         if height:
             self.set_height(height)
 
+    def __getitem__(self, i):
+        return self.__items[i]
+
     def __iter__(self):
-        return LayoutIterator(self)
+        return iter(self.__items)
+
+    def __len__(self):
+        return len(self.__items)
 
-    def __do_insert_after(self, item, target):
-        is_head = target.prev() is None
+    def __clean(self):
+        self.__dirty = None
+        self.__pending.clear()
 
-        if is_head:
-            self.__head = item
+    def __count(self, size, sign):
+        """Учитывает размер добавленного (sign=1) или удаленного (sign=-1) элемента в суммах."""
+        value, unit = size
+
+        if unit is None:
+            self.__flex += sign * value
+        elif unit == 'px':
+            self.__fixed += sign * value
         else:
-            target.prev().set_next(item)
-            item.set_prev(target.prev())
+            count = self.__percents.get(value, 0) + sign
 
-        item.set_next(target)
-        target.set_prev(item)
+            if count:
+                self.__percents[value] = count
+            else:
+                del self.__percents[value]
 
-    def __do_insert_before(self, item, target):
-        is_tail = target.next() is None
+    def __notify(self):
+        """Сообщает родительским слоям, что внутри этого слоя есть изменения."""
+        child, parent = self, self.layout()
 
-        if is_tail:
-            self.__tail = item
-        else:
-            target.next().set_prev(item)
-            item.set_next(target.next())
+        while parent is not None and child not in parent.__pending:
+            parent.__pending.add(child)
+            child, parent = parent, parent.layout()
 
-        item.set_prev(target)
-        target.set_next(item)
+    def __rect(self):
+        return self.x() or 0, self.y() or 0, self.width(), self.height()
 
-    def __insert(self, item, target=None, after=False):
+    def __insert(self, item, i):
         if not isinstance(item, AbstractItem):
             raise TypeError(t('incompatible_type_argument', name='item', type='AbstractItem'))
 
@@ -250,18 +324,53 @@ class Layout(AbstractItem):
         item.reset()
         item.set_layout(self)
 
-        if self.__head is None:
-            self.__head = item
-            self.__tail = item
+        self.__items.insert(i, item)
+        self.__renumber(i)
+        self.__count(item.size(), 1)
+        self.__invalidate(self.first_changed(i, item.size()[1]))
+
+    def __invalidate(self, i):
+        if i >= len(self.__items):
             return
 
+        if self.__dirty is None or i < self.__dirty:
+            self.__dirty = i
+
+        self.__notify()
+
+    def __renumber(self, start):
+        """Обновляет позиции элементов начиная со start."""
+        for i in range(start, len(self.__items)):
+            self.__items[i].set_position(i)
+
+    def __sync_monitor(self):
+        """Задает корневому слою геометрию привязанного монитора, если она изменилась."""
+        monitor = self.monitor()
+
+        if monitor is not None:
+            rect = monitor.workarea if self.__monitor[1] else monitor.rect
+
+            if rect != self.geometry():
+                self.set_geometry(*rect)
+
+    def __locate(self, target):
         if not isinstance(target, AbstractItem):
             raise TypeError(t('incompatible_type_argument', name='target', type='AbstractItem'))
 
-        self.__do_insert_after(item, target) if after else self.__do_insert_before(item, target)
+        return self.index(target)
 
     def append(self, item):
-        return self.__insert(item, self.last(), after=False)
+        return self.__insert(item, len(self.__items))
+
+    def bind_monitor(self, name=None, workarea=True):
+        """
+        Привязывает корневой слой к монитору с именем name (основному, если имя не указано): слой занимает
+        его рабочую область или, с workarea=False, весь монитор. Кэш мониторов менеджера окон
+        сбрасывается при их подключении и отключении, после чего следующий plan(), move() или
+        relayout() один раз пересчитывает раскладку.
+        """
+        self.__monitor = (name, workarea)
+        self.__sync_monitor()
 
     def close(self):
         for item in self:
@@ -280,84 +389,276 @@ class Layout(AbstractItem):
     def direction(self):
         return self.__direction
 
+    def execute_all(self, timeout=5, move_each=False):
+        """
+        Одновременно запускает все LauncherItem дерева, для которых задана команда,
+        и размещает их окна, когда они появятся. С move_each=True каждое окно
+        размещается сразу после появления.
+        """
+        execute_launchers(self, timeout, move_each)
+
     def first(self):
-        return self.__head
+        return self.__items[0] if self.__items else None
+
+    def first_changed(self, i, unit):
+        """
+        Возвращает позицию первого элемента, геометрия которого меняется при вставке,
+        удалении или изменении размера элемента с единицами unit на позиции i.
+        """
+        # Элементы без единиц делят оставшееся место, поэтому при их наличии изменяются все.
+        return 0 if unit is None or self.__flex else i
+
+    def fixed_size(self, base):
+        """Сумма размеров элементов в px и % вдоль направления слоя размером base."""
+        return self.__fixed + sum(count * int(value * base / 100) for value, count in self.__percents.items())
+
+    def index(self, item):
+        """Возвращает позицию элемента в слое, ValueError - если элемента в слое нет."""
+        if item.layout() is not self:
+            raise ValueError(t('invalid_argument_value', name='item'))
+
+        return item.position()
 
     def insert_after(self, item, target):
-        self.__insert(item, target, after=True)
+        """Вставляет item перед target: так этот метод работал всегда, и вызывающий код на это рассчитывает."""
+        self.__insert(item, self.__locate(target))
 
     def insert_before(self, item, target):
-        self.__insert(item, target, after=False)
+        """Вставляет item после target, см. insert_after()."""
+        self.__insert(item, self.__locate(target) + 1)
+
+    def invalidate(self, item=None):
+        """
+        Помечает для пересчета элементы слоя начиная с item (по умолчанию все).
+        Геометрия будет пересчитана при следующем обращении к ней или вызове update().
+        """
+        self.__invalidate(0 if item is None else self.index(item))
 
     def item_count(self):
-        count = 0
+        return self.__flex
+
+    def last(self):
+        return self.__items[-1] if self.__items else None
+
+    def launchers(self):
+        launchers = []
 
         for item in self:
-            value, unit = item.size()
+            launchers.extend(item.launchers())
 
-            if unit:
-                break
+        return launchers
 
-            count += value
+    def monitor(self):
+        """Возвращает Monitor, к которому привязан слой, или None."""
+        if self.__monitor is None:
+            return None
 
-        return count
+        return WindowManager.monitor(self.__monitor[0])
 
-    def last(self):
-        return self.__tail
+    def move(self, tolerance=0):
+        """
+        Перемещает окна, отличающиеся от раскладки больше чем на tolerance пикселей.
+        Возвращает количество окон, которые уже были на своих местах.
+        """
+        return WindowManager.move_changed(self.plan(), tolerance)
+
+    def plan(self):
+        self.root().__sync_monitor()
+        self.update()
+        plan = []
 
-    def move(self):
         for item in self:
-            item.move()
+            plan.extend(item.plan())
+
+        return plan
+
+    def relayout(self, tolerance=0):
+        """Аналог move() только для окон, геометрия которых изменилась после последнего расчета."""
+        return WindowManager.move_changed(self.update_plan(), tolerance)
+
+    def place(self, rect, start=0):
+        """
+        Возвращает [(item, (x, y, width, height))] для элементов слоя, занимающего
+        прямоугольник rect, начиная с позиции start.
+        """
+        return place(self, rect, start)
 
     def remove(self, item):
         if not isinstance(item, AbstractItem):
             raise TypeError(t('incompatible_type_argument', name='item', type='AbstractItem'))
 
-        if item.prev() is None:
-            self.__head = item.next()
-        else:
-            item.prev().set_next(item.next())
-
-        if item.next() is None:
-            self.__tail = item.prev()
-        else:
-            item.next().set_prev(item.prev())
+        i = self.index(item)
+        del self.__items[i]
+        self.__renumber(i)
 
+        self.__pending.discard(item)
+        self.__count(item.size(), -1)
         item.reset()
 
+        if self.__dirty is not None and self.__dirty >= len(self.__items):
+            self.__dirty = None
+
+        self.__invalidate(self.first_changed(i, item.size()[1]))
+
+    def resize_item(self, item, size):
+        """
+        Учитывает новый размер элемента слоя и помечает затронутые элементы.
+        Вызывается из AbstractItem.set_size() до изменения размера.
+        """
+        i = self.index(item)
+        old_unit = item.size()[1]
+
+        self.__count(item.size(), -1)
+        self.__count(size, 1)
+        self.__invalidate(self.first_changed(i, None if old_unit is None else size[1]))
+
+    def schedule(self, scheduler):
+        """
+        Передает окна, геометрия которых изменилась, планировщику MoveScheduler
+        и возвращает Future пакета, в котором они будут перемещены.
+        """
+        return scheduler.submit(self.update_plan())
+
+    def solve(self):
+        """
+        Рассчитывает геометрию всех вложенных элементов за один проход
+        и возвращает список (item, (x, y, width, height)).
+        """
+        rect = self.__rect()
+        plan = solve(self, rect)
+
+        self.__clean()
+        self.__solved_rect = rect
+
+        for item, rect in plan:
+            item.set_geometry(*rect)
+
+            if isinstance(item, Layout):
+                item.__clean()
+
+        return plan
+
+    def unbind_monitor(self):
+        """Отменяет привязку к монитору, слой сохраняет последнюю геометрию."""
+        self.__monitor = None
+
+    def update(self):
+        """
+        Пересчитывает только помеченные элементы дерева, в которое входит слой,
+        и возвращает список (item, (x, y, width, height)) элементов, геометрия которых изменилась.
+        """
+        root = self.root()
+        rect = root.__rect()
+
+        if rect != root.__solved_rect:
+            root.__solved_rect = rect
+            root.invalidate()
+        elif root.__dirty is None and not root.__pending:
+            return []
+
+        changed = []
+        stack = [root]
+
+        while stack:
+            layout = stack.pop()
+            start, pending = layout.__dirty, layout.__pending
+            layout.__dirty, layout.__pending = None, set()
+
+            if start is not None:
+                for item, rect in layout.place(layout.__rect() if layout is root else layout.geometry(), start):
+                    if item.geometry() == rect:
+                        continue
+
+                    item.set_geometry(*rect)
+                    changed.append((item, rect))
+
+                    if isinstance(item, Layout) and item.__items:
+                        item.__dirty = 0
+                        pending.add(item)
+
+            stack.extend(pending)
+
+        return changed
+
+    def update_plan(self):
+        """Аналог plan() только для окон элементов, геометрия которых изменилась при update()."""
+        self.root().__sync_monitor()
+        plan = []
+
+        for item, _ in self.update():
+            if not isinstance(item, Layout):
+                plan.extend(item.plan())
+
+        return plan
+
     def validate(self, item, throw=True):
         if not isinstance(item, AbstractItem):
             raise TypeError(t('incompatible_type_argument', name='item', type='AbstractItem'))
 
-        if self.last() is None:
-            return True
+        return True
 
-        _, src_unit = self.last().size()
-        _, unit = item.size()
 
-        if unit != src_unit:
-            if throw:
-                raise RuntimeError(t('invalid_units', unit=unit, layout_unit=src_unit))
-            return False
+class GridLayout(Layout):
+    """
+    Слой-сетка: элементы занимают ячейки по строкам, все ячейки рассчитываются одним шагом.
+    columns и rows - количество одинаковых дорожек или список их размеров (1, '50%', '100px'),
+    с rows=None строки добавляются по мере заполнения. gap - промежуток между ячейками в пикселях.
+    Размеры самих элементов сетки не учитываются.
+    """
+    __slots__ = ('__columns', '__rows', '__gap')
 
-        return True
+    def __init__(self, columns=1, rows=None, gap=0, width=None, height=None, x=None, y=None, *args, **kwargs):
+        super().__init__(Layout.HORIZONTAL, width, height, x, y, *args, **kwargs)
 
+        self.__columns = columns
+        self.__rows = rows
+        self.__gap = gap
 
-class LayoutIterator(object):
-    def __init__(self, layout):
-        if not isinstance(layout, Layout):
-            raise TypeError(t('incompatible_type_argument', name='layout', type='Layout'))
+    def __capacity(self):
+        return self.__tracks(self.__columns) * self.__tracks(self.__rows) if self.__rows is not None else None
 
-        self.__start = layout.first()
+    @staticmethod
+    def __tracks(tracks):
+        return tracks if isinstance(tracks, int) else len(tracks)
 
-    def __next__(self):
-        if self.__start is None:
-            raise StopIteration
+    def columns(self):
+        return self.__columns
 
-        item = self.__start
-        self.__start = item.next()
+    def debug(self):
+        print(DEBUG_STR.format('Сетка', '{} x {}'.format(self.__columns, self.__rows)))
+        super().debug()
+
+    def first_changed(self, i, unit):
+        # При автоматическом добавлении строк может измениться высота всех ячеек.
+        return 0 if self.__rows is None else i
+
+    def gap(self):
+        return self.__gap
+
+    def place(self, rect, start=0):
+        rows = self.__rows
+
+        if rows is None:
+            rows = max(1, ceil(len(self) / self.__tracks(self.__columns)))
+
+        cells = grid(rect, rows, self.__columns, self.__gap)
+
+        return list(zip(self[start:], cells[start:]))
 
-        return item
+    def resize_item(self, item, size):
+        """Размеры элементов сетки не учитываются, пересчет не нужен."""
 
-    # Create an alias so that Python 2.x won't complain about not being an iterator.
-    next = __next__
+    def rows(self):
+        return self.__rows
+
+    def validate(self, item, throw=True):
+        super().validate(item, throw)
+
+        capacity = self.__capacity()
+
+        if capacity is not None and len(self) >= capacity:
+            if throw:
+                raise RuntimeError(t('grid_is_full', capacity=capacity))
+            return False
+
+        return True
@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+
+import logging
+from threading import Event, Thread
+from time import monotonic
+
+from screen_god.composite.base import Layout
+from screen_god.composite.items import LauncherItem
+from screen_god.manager import NoSuchWindowException, WindowManager
+from screen_god.messages import t
+
+
+logger = logging.getLogger(__name__)
+
+
+def leaves(layout):
+    """Возвращает все элементы дерева layout, кроме слоев."""
+    items = []
+    stack = [layout]
+
+    while stack:
+        for item in stack.pop():
+            if isinstance(item, Layout):
+                stack.append(item)
+            else:
+                items.append(item)
+
+    return items
+
+
+class Enforcer(object):
+    """
+    Удерживает окна раскладки на своих местах.
+
+    Подписывается на события перемещения, изменения размеров и закрытия окон дерева
+    и возвращает на место только сместившиеся окна. События накапливаются, пока окна
+    меняются чаще, чем раз в debounce секунд, но не дольше interval секунд, и раскладка
+    применяется не чаще раза в interval секунд. Пока окна не меняются, поток спит в ожидании
+    событий. С relaunch=True LauncherItem, окно которого закрылось, запускается заново.
+    Ошибка менеджера окон или перезапуска записывается в журнал, и через interval секунд
+    наблюдение начинается заново с полного применения раскладки.
+    """
+
+    def __init__(self, layout, interval=0.5, debounce=0.1, tolerance=0, relaunch=False, timeout=5):
+        self.interval = interval
+        self.debounce = debounce
+        self.tolerance = tolerance
+        self.relaunch = relaunch
+        self.timeout = timeout
+
+        self.__layout = layout
+        self.__stopped = Event()
+        self.__thread = None
+        self.__applied = 0
+
+    def __collect(self, watcher, changed):
+        """Дожидается конца серии событий и возвращает все изменившиеся окна или None."""
+        started = monotonic()
+        deadline = max(started + self.debounce, self.__applied + self.interval)
+
+        while not self.__stopped.is_set():
+            remaining = deadline - monotonic()
+
+            if remaining <= 0:
+                break
+
+            more = watcher.wait(min(remaining, self.debounce))
+
+            if more is None or changed is None:
+                changed = None
+            else:
+                changed |= more
+
+            # Окна еще меняются: ждем тишины, но не дольше interval с первого события.
+            if more:
+                deadline = max(deadline, min(monotonic() + self.debounce, started + self.interval))
+
+        return changed
+
+    def __run(self, idle_timeout):
+        while not self.__stopped.is_set():
+            try:
+                self.__watch(idle_timeout)
+            except Exception:
+                WindowManager.metrics().count('enforce_errors')
+                logger.exception(t('enforcer_failed', interval=self.interval))
+                self.__stopped.wait(self.interval)
+
+    def __relaunch(self, hwnds):
+        """Запускает заново LauncherItem, окна которых закрылись. Возвращает их количество."""
+        dead = []
+
+        for item in leaves(self.__layout):
+            hwnd = item.hwnd() if isinstance(item, LauncherItem) else None
+
+            if hwnd is not None and (hwnds is None or hwnd in hwnds) and not WindowManager.is_exists(hwnd):
+                dead.append(item)
+
+        if not dead:
+            return 0
+
+        for item in dead:
+            item.close()
+
+        WindowManager.metrics().count('enforce_relaunches', len(dead))
+
+        try:
+            self.__layout.execute_all(self.timeout)
+        except NoSuchWindowException:
+            pass
+
+        return len(dead)
+
+    def __watch(self, idle_timeout):
+        self.enforce()
+
+        watcher = None
+        monitors = WindowManager.monitors_serial()
+
+        try:
+            while not self.__stopped.is_set():
+                hwnds = self.hwnds()
+
+                if watcher is None or watcher.hwnds != hwnds:
+                    if watcher is not None:
+                        watcher.close()
+
+                    watcher = WindowManager.watch_windows(hwnds)
+
+                changed = watcher.wait(idle_timeout)
+
+                if monitors != WindowManager.monitors_serial():
+                    monitors = WindowManager.monitors_serial()
+                    changed = None
+                elif changed is not None and not changed:
+                    continue
+
+                changed = self.__collect(watcher, changed)
+
+                if not self.__stopped.is_set():
+                    self.enforce(changed)
+        finally:
+            if watcher is not None:
+                watcher.close()
+
+    def enforce(self, hwnds=None):
+        """
+        Возвращает на место сместившиеся окна из hwnds (по умолчанию все окна дерева)
+        и возвращает количество перемещенных окон.
+        """
+        if self.relaunch:
+            self.__relaunch(hwnds)
+
+        plan = [geometry for geometry in self.__layout.plan() if hwnds is None or geometry[0] in hwnds]
+        skipped = WindowManager.move_changed(plan, self.tolerance)
+
+        self.__applied = monotonic()
+        WindowManager.metrics().count('enforce_passes')
+
+        return len(plan) - skipped
+
+    def hwnds(self):
+        """Окна дерева, за которыми следит наблюдатель."""
+        return {item.hwnd() for item in leaves(self.__layout) if item.hwnd() is not None}
+
+    def is_alive(self):
+        return self.__thread is not None and self.__thread.is_alive()
+
+    def run(self, idle_timeout=1.0):
+        """
+        Следит за окнами в текущем потоке до вызова stop().
+        idle_timeout - как часто проверяется stop() и конфигурация мониторов, пока событий нет.
+        """
+        self.__stopped.clear()
+        self.__run(idle_timeout)
+
+    def start(self, idle_timeout=1.0):
+        """Запускает run() в фоновом потоке."""
+        if self.is_alive():
+            return
+
+        self.__stopped.clear()
+        self.__thread = Thread(target=self.__run, args=(idle_timeout,), daemon=True)
+        self.__thread.start()
+
+    def stop(self, timeout=None):
+        self.__stopped.set()
+
+        if self.__thread is not None:
+            self.__thread.join(timeout)
+            self.__thread = None
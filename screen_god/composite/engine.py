@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+
+"""
+Пакетный расчет геометрии сетки: прямоугольники всех ячеек вычисляются за один проход.
+Дорожки без единиц делят место, оставшееся после дорожек в % и px. Результаты совпадают
+с Layout.solve(), включая отбрасывание дробной части.
+"""
+
+from screen_god.composite.solver import parse_size
+
+
+def grid(rect, rows=1, columns=1, gap=0):
+    """
+    Рассчитывает ячейки сетки, занимающей прямоугольник rect (x, y, width, height).
+    rows и columns - количество одинаковых дорожек или список их размеров (1, '50%', '100px'),
+    gap - промежуток между дорожками в пикселях.
+    Возвращает список (x, y, width, height) ячеек по строкам, как у вертикального
+    слоя из горизонтальных слоев-строк.
+    """
+    x, y, width, height = rect
+
+    tops, heights = split(rows, height, y, gap)
+    lefts, widths = split(columns, width, x, gap)
+
+    return [
+        (left, top, cell_width, cell_height)
+        for top, cell_height in zip(tops, heights)
+        for left, cell_width in zip(lefts, widths)
+    ]
+
+
+def plan(hwnds, rects):
+    """Возвращает план для WindowManager.move_changed() и move_many(), окна None пропускаются."""
+    return [(hwnd,) + tuple(rect) for hwnd, rect in zip(hwnds, rects) if hwnd is not None]
+
+
+def split(tracks, base, offset=0, gap=0):
+    """
+    Делит отрезок длиной base, начинающийся в offset, на дорожки.
+    tracks - количество одинаковых дорожек или список их размеров (1, '50%', '100px'),
+    между дорожками остается gap пикселей. Возвращает списки (offsets, lengths).
+    """
+    if isinstance(tracks, int):
+        tracks = [1] * tracks
+
+    sizes = [parse_size(size) for size in tracks]
+    base -= gap * (len(sizes) - 1)
+    total = sum(value for value, unit in sizes if unit is None)
+
+    fixed = [0 if unit is None else int(value * base / 100) if unit == '%' else value for value, unit in sizes]
+    free = max(base - sum(fixed), 0)
+    lengths = [int(value * free / total) if unit is None else length for (value, unit), length in zip(sizes, fixed)]
+    offsets = []
+
+    for length in lengths:
+        offsets.append(offset)
+        offset += length + gap
+
+    return offsets, lengths
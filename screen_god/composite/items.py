@@ -1,18 +1,21 @@
 # -*- coding: utf-8 -*-
 
-from time import sleep
 from subprocess import PIPE
-from threading import Thread
 
 import psutil
 from psutil import pid_exists
 
+from screen_god.capture import RingBuffer, SpillSegments
 from screen_god.composite.base import DEBUG_STR, AbstractItem
 from screen_god.manager import WindowManager
 from screen_god.messages import t
+from screen_god.metrics import Metrics
+from screen_god.output import BLOCK, HandlerQueue, Reactor
 
 
 class Item(AbstractItem):
+    __slots__ = ('__hwnd',)
+
     def __init__(self, wnd=None, select_by_click=False, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
@@ -34,11 +37,14 @@ class Item(AbstractItem):
         ]))
         super().debug()
 
-    def move(self):
+    def move(self, tolerance=0):
+        return WindowManager.move_changed(self.plan(), tolerance)
+
+    def plan(self):
         if self.__hwnd is None:
             raise RuntimeError(t('window_not_set'))
 
-        WindowManager.move(self.__hwnd, self.x(), self.y(), self.width(), self.height())
+        return [(self.__hwnd,) + self.rect()]
 
     def set_window(self, wnd, select_by_click=False):
         if isinstance(wnd, int):
@@ -57,28 +63,89 @@ class Item(AbstractItem):
 
 
 class LauncherItem(AbstractItem):
+    """
+    Элемент, окно которого создает запускаемый процесс.
+    Вывод процесса читается общим потоком ввода-вывода, если заданы фабрики обработчиков
+    stdout_handler и stderr_handler. Строки передаются обработчику через очередь
+    не больше queue_size строк с политикой переполнения overflow (см. screen_god.output).
+
+    С capture > 0 последние capture байтов каждого канала сохраняются в кольцевом буфере
+    и доступны через tail(), даже без обработчиков. spill - параметры SpillSegments
+    (словарь или True) для сохранения вытесненного из буфера вывода на диск.
+    """
+
+    __slots__ = (
+        '__cmd', '__hwnd', '__proc', '__stdout_handler', '__stderr_handler', '__kwargs',
+        '__queue_size', '__overflow', '__metrics', '__capture', '__spill', '__captures',
+    )
+
     def __merge_kwargs(self, kwargs):
-        if self.__stdout_handler:
+        if self.__stdout_handler or self.__capture:
             kwargs['stdout'] = PIPE
 
-        if self.__stderr_handler:
+        if self.__stderr_handler or self.__capture:
             kwargs['stderr'] = PIPE
 
         return kwargs
 
-    def __init__(self, size=1, stdout_handler=None, stderr_handler=None, **kwargs):
+    def __start_capture(self):
+        """Создает буферы вывода нового процесса, буферы предыдущего удаляются."""
+        for capture in self.__captures.values():
+            capture.close()
+
+        self.__captures = {}
+
+        if not self.__capture:
+            return
+
+        for name in ('stdout', 'stderr'):
+            stream = getattr(self.__proc, name)
+
+            if stream is None:
+                continue
+
+            spill = None
+
+            if self.__spill:
+                spill = SpillSegments(**(self.__spill if isinstance(self.__spill, dict) else {}))
+
+            self.__captures[name] = RingBuffer(self.__capture, spill, getattr(stream, 'encoding', None))
+
+    def __init__(self, size=1, stdout_handler=None, stderr_handler=None, cmd=None,
+                 queue_size=10000, overflow=BLOCK, capture=0, spill=None, **kwargs):
         super(LauncherItem, self).__init__(size)
 
+        self.__cmd = cmd
         self.__hwnd = None
         self.__proc = None
-        self.__thread = None
 
         self.__stdout_handler = stdout_handler
         self.__stderr_handler = stderr_handler
+        self.__queue_size = queue_size
+        self.__overflow = overflow
+        self.__metrics = Metrics()
+        self.__capture = capture
+        self.__spill = spill
+        self.__captures = {}
 
         self.__kwargs = self.__merge_kwargs(kwargs)
 
+    def attach(self, hwnd, proc):
+        """Связывает элемент с окном и процессом, запущенными WindowManager.Popen()."""
+        self.__hwnd, self.__proc = hwnd, proc
+
+        if self.__proc:
+            self.__start_capture()
+            self.listen()
+
+    def capture(self, name='stdout'):
+        """Кольцевой буфер канала stdout или stderr последнего процесса или None."""
+        return self.__captures.get(name)
+
     def close(self):
+        for stream in self.streams():
+            Reactor.default().remove(stream)
+
         if self.__proc and pid_exists(self.__proc.pid):
             for proc in self.__proc.children(recursive=True):
                 proc.terminate()
@@ -90,7 +157,11 @@ class LauncherItem(AbstractItem):
 
         self.__hwnd = None
         self.__proc = None
-        self.__thread = None
+
+    def command(self, cmd=None, **kwargs):
+        """Возвращает аргументы запуска (cargs, kwargs) для WindowManager.Popen_many()."""
+        kwargs = self.__merge_kwargs(dict(self.__kwargs, **kwargs))
+        return cmd or self.__cmd, kwargs
 
     def debug(self):
         print('\n'.join([
@@ -100,34 +171,70 @@ class LauncherItem(AbstractItem):
         ]))
         super().debug()
 
-    def execute(self, cmd, **kwargs):
+    def execute(self, cmd=None, **kwargs):
         if self.__proc:
             return
 
-        kwargs = self.__merge_kwargs(kwargs)
+        cmd, kwargs = self.command(cmd, **kwargs)
+
+        if cmd is None:
+            raise ValueError(t('invalid_argument_value', name='cmd'))
 
-        self.__hwnd, self.__proc = WindowManager.Popen(cmd, **kwargs)
+        self.attach(*WindowManager.Popen(cmd, **kwargs))
         self.move()
 
-        if self.__stdout_handler:
-            stdout_handler = self.__stdout_handler()
+    def handlers(self):
+        """Возвращает фабрики обработчиков вывода (stdout_handler, stderr_handler)."""
+        return self.__stdout_handler, self.__stderr_handler
+
+    def hwnd(self):
+        return self.__hwnd
+
+    def launchers(self):
+        return [] if self.__proc or self.__cmd is None else [self]
+
+    def listen(self):
+        """Передает каналы stdout и stderr процесса общему потоку ввода-вывода."""
+        for name, factory in zip(('stdout', 'stderr'), self.handlers()):
+            stream, capture = getattr(self.__proc, name), self.capture(name)
+
+            if stream is not None and (factory or capture):
+                Reactor.default().add(stream, self.queue(factory() if factory else None), capture)
+
+    def move(self, tolerance=0):
+        return WindowManager.move_changed(self.plan(), tolerance)
 
-            self.__thread = Thread(target=self.reader, args=(self.__proc.stdout, stdout_handler))
-            self.__thread.start()
+    def output_metrics(self):
+        """Счетчики чтения вывода: lines, batches, dropped, blocked и errors."""
+        return self.__metrics
 
-    def move(self):
+    def plan(self):
         if self.__hwnd:
-            WindowManager.move(self.__hwnd, self.x(), self.y(), self.width(), self.height())
+            return [(self.__hwnd,) + self.rect()]
+
+        return []
+
+    def process(self):
+        return self.__proc
+
+    def queue(self, handler):
+        """Очередь HandlerQueue для обработчика вывода с настройками элемента или None без обработчика."""
+        if handler is None:
+            return None
 
-    def reader(self, std_thread, handler):
-        while True:
-            line = std_thread.readline()
+        return HandlerQueue(handler, self.__queue_size, self.__overflow, self.__metrics)
 
-            if not line:
-                return
+    def streams(self):
+        """Каналы вывода процесса, которые читают обработчики и буферы."""
+        if not self.__proc:
+            return []
 
-            line = line.rstrip()
-            handler.execute(line)
-            sleep(0.1)
+        return [
+            getattr(self.__proc, name) for name, factory in zip(('stdout', 'stderr'), self.handlers())
+            if getattr(self.__proc, name) is not None and (factory or self.capture(name))
+        ]
 
-        self.__thread.join()
+    def tail(self, n=10, name='stdout'):
+        """Последние n строк канала stdout или stderr, сохраненные с capture."""
+        capture = self.capture(name)
+        return capture.tail(n) if capture is not None else []
@@ -0,0 +1,246 @@
+# -*- coding: utf-8 -*-
+
+"""
+Раскладки, описанные в файлах JSON или TOML.
+
+    {
+        "direction": "vertical", "x": 10, "y": 50, "width": 1400, "height": 900,
+        "items": [
+            {"direction": "horizontal", "items": [
+                {"cmd": ["designer"]},
+                {"cmd": ["vlc"], "size": "30%"}
+            ]},
+            {"window": "Firefox", "size": 2}
+        ]
+    }
+
+Элемент с ключом items - слой (Layout, а если задан ключ columns - GridLayout с ключами
+columns, rows и gap), с ключом cmd - LauncherItem (kwargs передаются в Popen),
+с ключом window - Item для окна с этим заголовком или PID процесса.
+Размеры корневого слоя, не указанные в файле, задаются при загрузке.
+
+restore() компилирует файл в плоский план размещения и кэширует его на диске.
+Ключ кэша - хэш содержимого файла и размеров экрана, поэтому повторное
+восстановление неизмененной раскладки не разбирает файл и не рассчитывает геометрию.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+
+from screen_god.composite.base import GridLayout, Layout, execute_launchers
+from screen_god.composite.items import Item, LauncherItem
+from screen_god.manager import WindowManager
+from screen_god.messages import t
+
+
+# Версия формата кэшированного плана, входит в ключ кэша.
+PLAN_VERSION = 1
+
+
+def build(spec, width=None, height=None, x=0, y=0, leaves=None, windows=True):
+    """
+    Создает дерево элементов по описанию раскладки и возвращает корневой слой.
+    Размеры корневого слоя из описания имеют приоритет над аргументами.
+    В leaves добавляются пары (элемент, описание) для всех элементов, кроме слоев.
+    windows=False не ищет окна элементов с ключом window.
+    """
+    root = item_from_spec(spec, [] if leaves is None else leaves, windows)
+
+    if not isinstance(root, Layout):
+        raise ValueError(t('invalid_argument_value', name='spec'))
+
+    width, height = spec.get('width', width), spec.get('height', height)
+
+    if width is None or height is None:
+        raise ValueError(t('invalid_argument_value', name='width' if width is None else 'height'))
+
+    root.set_x(spec.get('x', x))
+    root.set_y(spec.get('y', y))
+    root.set_width(width)
+    root.set_height(height)
+
+    return root
+
+
+def cache_dir():
+    """Каталог кэша планов по умолчанию."""
+    base = os.environ.get('XDG_CACHE_HOME') or os.environ.get('LOCALAPPDATA') or os.path.expanduser('~/.cache')
+    return os.path.join(base, 'screen-god')
+
+
+def compile_plan(spec, width=None, height=None, x=0, y=0):
+    """
+    Рассчитывает раскладку и возвращает плоский план: список описаний окон
+    (cmd, kwargs или window) с ключом rect - [x, y, width, height].
+    """
+    leaves = []
+    build(spec, width, height, x, y, leaves, windows=False).solve()
+
+    plan = []
+
+    for item, leaf in leaves:
+        entry = {key: leaf[key] for key in ('cmd', 'kwargs', 'window') if key in leaf}
+        entry['rect'] = list(item.geometry())
+        plan.append(entry)
+
+    return plan
+
+
+def item_from_entry(entry):
+    """Создает элемент по записи плана и задает ему рассчитанную геометрию."""
+    if 'cmd' in entry:
+        item = LauncherItem(cmd=entry['cmd'], **entry.get('kwargs', {}))
+    elif 'window' in entry:
+        item = Item(entry['window'])
+    else:
+        item = Item()
+
+    item.set_geometry(*entry['rect'])
+
+    return item
+
+
+def item_from_spec(spec, leaves, windows=True):
+    """Создает элемент дерева по его описанию, элементы без вложенных добавляются в leaves."""
+    if not isinstance(spec, dict):
+        raise ValueError(t('invalid_argument_value', name='spec'))
+
+    size = spec.get('size', 1)
+
+    if 'items' in spec:
+        if 'columns' in spec:
+            layout = GridLayout(spec['columns'], spec.get('rows'), spec.get('gap', 0), size=size)
+        else:
+            layout = Layout(spec.get('direction', Layout.HORIZONTAL), size=size)
+
+        for child in spec['items']:
+            layout.append(item_from_spec(child, leaves, windows))
+
+        return layout
+
+    if 'cmd' in spec:
+        item = LauncherItem(size, cmd=spec['cmd'], **spec.get('kwargs', {}))
+    elif 'window' in spec and windows:
+        item = Item(spec['window'], size=size)
+    else:
+        item = Item(size=size)
+
+    leaves.append((item, spec))
+
+    return item
+
+
+def load(path, data=None):
+    """Читает описание раскладки из файла .json или .toml."""
+    data = read_file(path) if data is None else data
+    ext = os.path.splitext(path)[1].lower()
+
+    if ext == '.json':
+        return json.loads(data.decode('utf-8'))
+
+    if ext == '.toml':
+        try:
+            import tomllib
+        except ImportError:
+            import tomli as tomllib
+
+        return tomllib.loads(data.decode('utf-8'))
+
+    raise ValueError(t('unsupported_layout_format', ext=ext))
+
+
+def read_file(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def restore(path, width=None, height=None, x=0, y=0, cache=None):
+    """
+    Восстанавливает раскладку из файла и возвращает Workspace.
+    cache - каталог кэша планов, по умолчанию cache_dir(); False отключает кэш.
+    """
+    data = read_file(path)
+
+    if cache is False:
+        return Workspace(compile_plan(load(path, data), width, height, x, y))
+
+    key = hashlib.sha256(data)
+    key.update(json.dumps([PLAN_VERSION, x, y, width, height]).encode('utf-8'))
+
+    cache = cache or cache_dir()
+    filename = os.path.join(cache, key.hexdigest() + '.json')
+
+    try:
+        with open(filename) as f:
+            return Workspace(json.load(f))
+    except (OSError, ValueError):
+        pass
+
+    plan = compile_plan(load(path, data), width, height, x, y)
+
+    try:
+        write_plan(cache, filename, plan)
+    except (OSError, TypeError, ValueError):
+        # Кэш необязателен: недоступный каталог или план, который нельзя сохранить в JSON,
+        # означают только, что в следующий раз раскладка будет рассчитана заново.
+        pass
+
+    return Workspace(plan)
+
+
+def write_plan(directory, filename, plan):
+    """
+    Записывает план в кэш. Файл записывается целиком под временным именем,
+    чтобы кэш не оказался поврежденным; при ошибке временный файл удаляется.
+    """
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(plan, f)
+
+        os.replace(tmp, filename)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+
+        raise
+
+
+class Workspace(object):
+    """Окна раскладки с уже рассчитанной геометрией, восстановленные из плана."""
+
+    def __init__(self, plan):
+        self.__items = [item_from_entry(entry) for entry in plan]
+
+    def close(self):
+        for item in self.__items:
+            if isinstance(item, LauncherItem) or item.hwnd() is not None:
+                item.close()
+
+    def execute_all(self, timeout=5, move_each=False):
+        """Аналог Layout.execute_all() для окон плана."""
+        execute_launchers(self, timeout, move_each)
+
+    def items(self):
+        return list(self.__items)
+
+    def launchers(self):
+        return [launcher for item in self.__items for launcher in item.launchers()]
+
+    def move(self, tolerance=0):
+        return WindowManager.move_changed(self.plan(), tolerance)
+
+    def plan(self):
+        plan = []
+
+        for item in self.__items:
+            if item.hwnd() is not None:
+                plan.extend(item.plan())
+
+        return plan
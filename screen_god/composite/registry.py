@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+
+from collections import OrderedDict
+from threading import RLock
+import weakref
+
+from screen_god.metrics import Metrics
+
+
+class InstanceRegistry(object):
+    """
+    Реестр элементов по uid для AbstractItem.get_instance().
+
+    weak=True хранит слабые ссылки: элемент удаляется из реестра, когда на него
+    не остается других ссылок. maxsize ограничивает количество элементов,
+    при переполнении удаляются давно не запрашивавшиеся (LRU).
+    Счетчики hits, misses, evicted, collected и released доступны через metrics().
+    """
+
+    def __init__(self, maxsize=None, weak=False):
+        self.maxsize = maxsize
+        self.weak = weak
+
+        self.__items = OrderedDict()
+        # Сборщик мусора может вызвать обратный вызов слабой ссылки в любом месте, в том числе под блокировкой.
+        self.__lock = RLock()
+        self.__metrics = Metrics()
+
+    def __contains__(self, uid):
+        return self.get(uid, touch=False) is not None
+
+    def __len__(self):
+        return len(self.__items)
+
+    def __collected(self, uid, ref):
+        with self.__lock:
+            if self.__items.get(uid) is ref:
+                del self.__items[uid]
+                self.__metrics.count('collected')
+
+    def __evict(self):
+        while self.maxsize is not None and len(self.__items) > self.maxsize:
+            self.__items.popitem(last=False)
+            self.__metrics.count('evicted')
+
+    def clear(self):
+        with self.__lock:
+            self.__metrics.count('released', len(self.__items))
+            self.__items.clear()
+
+    def get(self, uid, touch=True):
+        """Возвращает элемент или None. touch=True отмечает элемент как недавно использованный."""
+        with self.__lock:
+            value = self.__items.get(uid)
+
+            if value is None:
+                return None
+
+            item = value() if isinstance(value, weakref.ref) else value
+
+            if item is not None and touch:
+                self.__items.move_to_end(uid)
+
+            return item
+
+    def get_or_create(self, uid, factory):
+        """Возвращает элемент uid, создавая его вызовом factory(), если его нет."""
+        with self.__lock:
+            item = self.get(uid)
+
+            if item is not None:
+                self.__metrics.count('hits')
+                return item
+
+            self.__metrics.count('misses')
+            item = factory()
+            self.put(uid, item)
+
+            return item
+
+    def metrics(self):
+        return self.__metrics
+
+    def put(self, uid, item):
+        with self.__lock:
+            if self.weak:
+                value = weakref.ref(item, lambda ref, uid=uid: self.__collected(uid, ref))
+            else:
+                value = item
+
+            self.__items[uid] = value
+            self.__items.move_to_end(uid)
+            self.__evict()
+
+    def release(self, uid):
+        """Удаляет элемент из реестра и возвращает его или None."""
+        with self.__lock:
+            value = self.__items.pop(uid, None)
+
+            if value is None:
+                return None
+
+            self.__metrics.count('released')
+
+            return value() if isinstance(value, weakref.ref) else value
+
+    def size(self):
+        """Количество элементов в реестре."""
+        return len(self.__items)
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+
+"""
+Расчет геометрии дерева раскладки за один проход сверху вниз.
+
+Размер элемента вдоль направления слоя:
+    % - процент от размера слоя: int(value * base / 100);
+    px - ровно value пикселей;
+    без единиц - доля места, оставшегося после элементов в % и px:
+    int(value * free / item_count).
+Поперек направления элемент занимает весь слой.
+"""
+
+from itertools import islice
+
+
+HORIZONTAL = 'horizontal'
+VERTICAL = 'vertical'
+
+UNITS = (None, '%', 'px')
+
+
+def parse_size(size):
+    """Разбирает размер элемента (1, '50%', '100px') в пару (value, unit)."""
+    size = size or 1
+
+    if isinstance(size, int):
+        return size, None
+
+    if isinstance(size, str):
+        digits = len(size) - len(size.lstrip('0123456789'))
+        value, unit = size[:digits], size[digits:] or None
+
+        if value and unit in UNITS:
+            return int(value), unit
+
+    raise ValueError('Unknown unit "{}".'.format(size))
+
+
+def place(layout, rect, start=0):
+    """
+    Возвращает [(item, (x, y, width, height))] для элементов layout, занимающего
+    прямоугольник rect, начиная с позиции start.
+    Геометрия элементов перед start должна быть уже рассчитана.
+    """
+    x, y, width, height = rect
+    horizontal = layout.direction() == HORIZONTAL
+    base = width if horizontal else height
+    total = layout.item_count()
+    free = max(base - layout.fixed_size(base), 0) if total else 0
+
+    if start:
+        prev_x, prev_y, prev_width, prev_height = layout[start - 1].geometry()
+        offset = prev_x + prev_width if horizontal else prev_y + prev_height
+    else:
+        offset = x if horizontal else y
+
+    plan = []
+
+    for item in islice(layout, start, None):
+        value, unit = item.size()
+
+        if unit is None:
+            size = int(value * free / total)
+        elif unit == '%':
+            size = int(value * base / 100)
+        else:
+            size = value
+
+        plan.append((item, (offset, y, size, height) if horizontal else (x, offset, width, size)))
+        offset += size
+
+    return plan
+
+
+def solve(layout, rect):
+    """
+    Возвращает [(item, (x, y, width, height))] для всех вложенных элементов layout,
+    занимающего прямоугольник rect. Слои идут в списке раньше своих элементов.
+    """
+    plan = []
+    stack = [(layout, rect)]
+
+    while stack:
+        layout, rect = stack.pop()
+
+        for item, item_rect in layout.place(rect):
+            plan.append((item, item_rect))
+
+            if hasattr(item, 'direction'):
+                stack.append((item, item_rect))
+
+    return plan
@@ -1,68 +1,368 @@
 # -*- coding: utf-8 -*-
 
+import atexit
+import os
+import re
+import select
+import subprocess
+from threading import Event, Lock
+
 import psutil
 
-from screen_god.common import run_command
-from screen_god.manager.WindowManager import WindowManager
+from screen_god.common import COMMAND_TIMEOUT, HelperProcess, run_command
+from screen_god.manager.cache import FrameCache
+from screen_god.manager.index import WindowIndex
+from screen_god.manager.monitors import Monitor
+from screen_god.manager.WindowManager import OpenedWatcher, WindowManager
+
+
+BORDERS = ['left', 'right', 'top', 'bottom']
+MAXIMIZED = {'_NET_WM_STATE_MAXIMIZED_VERT', '_NET_WM_STATE_MAXIMIZED_HORZ'}
+WATCHED_PROPS = ['_NET_FRAME_EXTENTS', '_NET_WM_STATE']
+WORKAREA_PROPS = ['_NET_WORKAREA', '_NET_CURRENT_DESKTOP']
+
+# Строка xrandr --listmonitors: номер, флаги (+ - автоматический, * - основной), WxH+X+Y с размерами в мм, имя.
+XRANDR_MONITOR_LINE = re.compile(r'^\s*\d+:\s+\+?(\*?)(\S+)\s+(\d+)/\d+x(\d+)/\d+\+(-?\d+)\+(-?\d+)')
+
+# Строка xwininfo -tree: идентификатор, имя и классы, WxH+X+Y относительно родителя, +X+Y на экране.
+XWININFO_TREE_LINE = re.compile(r'^\s*(0x[0-9a-fA-F]+)\b.*\s(\d+)x(\d+)[+-]-?\d+[+-]-?\d+\s+([+-]-?\d+)([+-]-?\d+)\s*$')
+
+
+def parse_xprop(output):
+    """Разбирает вывод xprop в словарь {свойство: [значения]}, у отсутствующих свойств - None."""
+    props = {}
+
+    for line in output.splitlines():
+        name, sep, value = line.partition('=')
+
+        if sep:
+            props[name.split('(')[0].strip()] = [v.strip() for v in value.split(',') if v.strip()]
+        elif line.endswith('not found.'):
+            props[line.split(':')[0].strip()] = None
+
+    return props
+
+
+def parse_xrandr_monitors(output):
+    """Разбирает вывод xrandr --listmonitors в список (name, x, y, width, height, primary)."""
+    monitors = []
+
+    for line in output.splitlines():
+        match = XRANDR_MONITOR_LINE.match(line)
+
+        if match:
+            primary, name, width, height, x, y = match.groups()
+            monitors.append((name, int(x), int(y), int(width), int(height), bool(primary)))
+
+    return monitors
+
+
+def parse_xwininfo_tree(output):
+    """Разбирает вывод xwininfo -root -tree в словарь {hwnd: (x, y, width, height)} на экране."""
+    windows = {}
+
+    for line in output.splitlines():
+        match = XWININFO_TREE_LINE.match(line)
+
+        if match:
+            hwnd, width, height, x, y = match.groups()
+            windows[int(hwnd, 16)] = (int(x.lstrip('+')), int(y.lstrip('+')), int(width), int(height))
+
+    return windows
+
+
+class XpropOpenedWatcher(OpenedWatcher):
+    """Ждет изменения _NET_CLIENT_LIST корневого окна с помощью xprop -spy."""
+
+    def __init__(self):
+        super().__init__()
+
+        self.__proc = subprocess.Popen(
+            ['xprop', '-root', '-spy', '_NET_CLIENT_LIST'],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL
+        )
+
+    def close(self):
+        if self.__proc.poll() is None:
+            self.__proc.terminate()
+
+        self.__proc.wait()
+        self.__proc.stdout.close()
+
+    def fileno(self):
+        return self.__proc.stdout.fileno()
+
+    def wait(self, timeout):
+        if self.__proc.poll() is not None:
+            return super().wait(timeout)
+
+        ready, _, _ = select.select([self.fileno()], [], [], max(0, timeout))
+
+        if not ready:
+            return False
+
+        # Содержимое не важно, достаточно факта изменения.
+        if not os.read(self.fileno(), 65536):
+            return super().wait(timeout)
+
+        return True
 
 
 class LinuxWindowManager(WindowManager):
+    """
+    Менеджер окон на основе wmctrl, xprop и xwininfo.
+    Команды запускаются без оболочки, их вывод разбирается в Python.
+
+    Декорация и состояние окна кэшируются, пока за окном следит процесс xprop -spy:
+    он запускается при первом обращении к окну, сразу сообщает текущие значения
+    и работает до уничтожения окна или stop_watchers(). Каждое окно стоит одного
+    постоянного процесса, поэтому их не больше max_watchers; для остальных окон
+    xprop запускается при каждом обращении, а значения не кэшируются.
+    """
+
+    # Время в секундах, после которого зависшая команда завершается.
+    command_timeout = COMMAND_TIMEOUT
+
+    # Наибольшее количество окон, за которыми одновременно следят процессы xprop -spy.
+    max_watchers = 32
+
+    def __init__(self):
+        self.__cache = FrameCache()
+        self.__lock = Lock()
+        self.__watchers = {}
+        self.__opened_serial = 0
+        self.__index_serial = None
+        self.__opened_watcher = None
+        self.__workarea_watcher = None
+        self.__workarea_props = {}
+
+        atexit.register(self.stop_watchers)
+
     def __hwnd2int(self, hwnd):
         hwnd = str(hwnd)
         return int(hwnd) if hwnd.isdigit() else int(hwnd, 16)
 
-    def __hwnd2hex(self, hwnd):
-        return format(hwnd, '#010x')
+    def __forget(self, hwnd):
+        # xprop завершается, когда окно уничтожено.
+        with self.__lock:
+            helper, _ = self.__watchers.get(hwnd, (None, None))
+
+            if helper is not None and not helper.is_alive():
+                del self.__watchers[hwnd]
+
+        self.__cache.drop(hwnd)
+
+    def __properties(self, hwnd):
+        """
+        Возвращает размеры декорации и множество состояний окна (borders, state) из кэша,
+        от наблюдателя или, если следить за окном нельзя, от xprop без кэширования.
+        """
+        if hwnd not in self.__cache:
+            self.__watch(hwnd)
+
+        borders = self.__cache.borders(hwnd)
+
+        if borders is not None:
+            return borders, self.__cache.state(hwnd) or frozenset()
+
+        output, _, code = self.__run('xprop', '-id', str(hwnd), *WATCHED_PROPS)
+        props = parse_xprop(output) if code == 0 else {}
+
+        # Без наблюдателя значения не кэшируются: об их изменении никто не сообщит.
+        values = props.get('_NET_FRAME_EXTENTS') or [0] * 4
+
+        return dict(zip(BORDERS, map(int, values))), frozenset(props.get('_NET_WM_STATE') or [])
+
+    def __run(self, *args):
+        self.metrics().count('commands')
+        return run_command(list(args), timeout=self.command_timeout)
+
+    def __update_cache(self, hwnd, props):
+        if '_NET_FRAME_EXTENTS' in props:
+            values = props['_NET_FRAME_EXTENTS'] or [0] * 4
+            self.__cache.set_borders(hwnd, dict(zip(BORDERS, map(int, values))))
+
+        if '_NET_WM_STATE' in props:
+            self.__cache.set_state(hwnd, props['_NET_WM_STATE'] or [])
+
+    def __watch(self, hwnd):
+        """
+        Запускает xprop -spy, который сначала сообщает текущие декорацию и состояние окна,
+        а затем их изменения, и ждет текущих значений. Возвращает True, если они в кэше.
+        """
+        with self.__lock:
+            helper, ready = self.__watchers.get(hwnd, (None, None))
+
+            if helper is None:
+                if len(self.__watchers) >= self.max_watchers:
+                    return False
+
+                ready = Event()
+                received = set()
+
+                def changed(line):
+                    props = parse_xprop(line)
+                    self.__update_cache(hwnd, props)
+                    received.update(props)
+
+                    if received.issuperset(WATCHED_PROPS):
+                        ready.set()
+
+                def exited():
+                    self.__forget(hwnd)
+                    ready.set()
 
-    def borders(cls, hwnd):
-        # свернуть, если окно развернуто на весь экран
-        cmd = 'wmctrl -i -r {} -b remove,maximized_vert,maximized_horz'.format(hwnd)
-        run_command(cmd)
+                self.metrics().count('commands')
 
-        cmd = 'xprop _NET_FRAME_EXTENTS -id {} | egrep -o [0-9]+'.format(hwnd)
-        result = run_command(cmd)
+                try:
+                    helper = HelperProcess(['xprop', '-spy', '-id', str(hwnd)] + WATCHED_PROPS, changed, exited)
+                except OSError:
+                    return False
 
-        props = ['left', 'right', 'top', 'bottom']
-        borders = {}
+                self.__watchers[hwnd] = (helper, ready)
 
-        for prop, value in zip(props, result[0].split()):
-            borders[prop] = int(value)
+        ready.wait(self.command_timeout)
 
-        return borders
+        return hwnd in self.__cache
+
+    def __watch_opened(self):
+        """Запускает xprop -spy, отмечающий изменения списка окон для сброса индекса."""
+        with self.__lock:
+            if self.__opened_watcher is not None and self.__opened_watcher.is_alive():
+                return True
+
+            def changed(line):
+                self.__opened_serial += 1
+
+            self.metrics().count('commands')
+
+            try:
+                self.__opened_watcher = HelperProcess(['xprop', '-root', '-spy', '_NET_CLIENT_LIST'], changed)
+            except OSError:
+                return False
+
+            return True
+
+    def __watch_workarea(self):
+        """Запускает xprop -spy, сбрасывающий кэш мониторов при изменении рабочей области."""
+        with self.__lock:
+            if self.__workarea_watcher is not None and self.__workarea_watcher.is_alive():
+                return
+
+            def changed(line):
+                for name, value in parse_xprop(line).items():
+                    # Первые строки xprop - текущие значения, а не изменения.
+                    if name in self.__workarea_props and self.__workarea_props[name] != value:
+                        self.invalidate_monitors()
+
+                    self.__workarea_props[name] = value
+
+            self.metrics().count('commands')
+
+            try:
+                self.__workarea_watcher = HelperProcess(['xprop', '-root', '-spy'] + WORKAREA_PROPS, changed)
+            except OSError:
+                pass
+
+    def __workarea(self):
+        """Рабочая область текущего рабочего стола из _NET_WORKAREA или None."""
+        output, _, code = self.__run('xprop', '-root', *WORKAREA_PROPS)
+        props = parse_xprop(output) if code == 0 else {}
+
+        workarea = [int(v) for v in props.get('_NET_WORKAREA') or []]
+        desktop = int((props.get('_NET_CURRENT_DESKTOP') or [0])[0])
+
+        if len(workarea) < 4 * (desktop + 1):
+            desktop = 0
+
+        return tuple(workarea[4 * desktop:4 * desktop + 4]) if len(workarea) >= 4 else None
+
+    def borders(self, hwnd):
+        return self.__properties(self.__hwnd2int(hwnd))[0]
+
+    def build_index(self):
+        output, _, _ = self.__run('wmctrl', '-l', '-p')
+        windows = []
+
+        for line in output.splitlines():
+            # Идентификатор, рабочий стол, PID, хост, заголовок (может отсутствовать).
+            columns = line.split(None, 4)
+
+            if len(columns) < 4:
+                continue
+
+            pid = int(columns[2])
+            title = columns[4] if len(columns) > 4 else ''
+
+            windows.append((self.__hwnd2int(columns[0]), pid if pid > 0 else None, title))
+
+        return WindowIndex(windows)
+
+    def build_monitors(self):
+        self.__watch_workarea()
+
+        workarea = self.__workarea()
+        output, _, code = self.__run('xrandr', '--listmonitors')
+        monitors = [Monitor(*monitor, workarea=workarea) for monitor in parse_xrandr_monitors(output if code == 0 else '')]
+
+        if not monitors:
+            output, _, _ = self.__run('xwininfo', '-root')
+            size = {}
+
+            for line in output.splitlines():
+                name, sep, value = line.partition(':')
+
+                if sep and name.strip() in ('Width', 'Height'):
+                    size[name.strip()] = int(value)
+
+            monitors.append(Monitor('default', 0, 0, size.get('Width', 0), size.get('Height', 0), True, workarea))
+
+        return monitors
 
     def close(self, hwnd):
-        res, err, code = run_command('xkill -id {}'.format(hwnd))
+        self.__run('xkill', '-id', str(self.__hwnd2int(hwnd)))
 
     def find_by_mouse_click(self):
         print('Please select window...')
 
-        hwnd, err, code = run_command('xwininfo | grep "Window id:" | cut -f 4 -d \ ')
+        # Ожидание щелчка пользователя не ограничено по времени.
+        self.metrics().count('commands')
+        output, err, code = run_command(['xwininfo'])
 
-        if code == 0:
-            return self.__hwnd2int(hwnd)
+        for line in output.splitlines():
+            # xwininfo: Window id: 0x3a00007 "Заголовок"
+            if 'Window id:' in line and code == 0:
+                return self.__hwnd2int(line.split('Window id:')[1].split()[0])
 
     def find_by_pid(self, pid):
         if not psutil.pid_exists(pid):
             return None
 
-        result = run_command('wmctrl -l -p | grep {} | cut -f1 -d\ '.format(pid))
-
-        return self.__hwnd2int(result[0]) if result[0] else None
+        hwnds = self.lookup(lambda index: index.by_pid(pid))
+        return hwnds[0] if hwnds else None
 
     def find_by_title(self, title):
-        result = run_command('wmctrl -l | grep "{}" | cut -f1 -d\ '.format(title))
-        return self.__hwnd2int(result[0]) if result[0] else None
+        hwnds = self.lookup(lambda index: index.by_title(title))
+        return hwnds[0] if hwnds else None
 
     def geometry(self, hwnd):
         """Returns without borders"""
 
-        cmd = 'xwininfo -id {} | egrep "(Absolute|Width|Height)" | egrep -o "[a-zA-Z]+:.*[0-9]+"'.format(
-            self.__hwnd2int(hwnd)
-        )
+        output, err, code = self.__run('xwininfo', '-id', str(self.__hwnd2int(hwnd)))
+
+        if code != 0:
+            return None
 
-        result, err, code = run_command(cmd)
-        result = [i.split(':') for i in result.split('\n')]
-        result = dict([p.strip().lower(), int(v.strip())] for p, v in result)
+        result = {}
+
+        for line in output.splitlines():
+            name, sep, value = line.partition(':')
+            name = name.strip()
+
+            # Absolute upper-left X, Absolute upper-left Y, Width, Height.
+            if sep and (name.startswith('Absolute') or name in ('Width', 'Height')):
+                result[name.split()[-1].lower()] = int(value)
 
         borders = self.borders(hwnd)
 
@@ -76,26 +376,102 @@ class LinuxWindowManager(WindowManager):
 
         return geometry
 
+    def geometry_many(self, hwnds):
+        # Одна команда возвращает абсолютные координаты всех окон, включая вложенные в рамки.
+        output, err, code = self.__run('xwininfo', '-root', '-tree')
+
+        if code != 0:
+            return super().geometry_many(hwnds)
+
+        windows = parse_xwininfo_tree(output)
+        result = []
+
+        for hwnd in hwnds:
+            rect = windows.get(self.__hwnd2int(hwnd))
+
+            if rect is None:
+                result.append(None)
+                continue
+
+            x, y, width, height = rect
+            borders = self.borders(hwnd)
+
+            result.append({
+                'hwnd': hwnd,
+                'left': x - borders['left'],
+                'top': y - borders['top'],
+                'width': width + borders['left'] + borders['right'],
+                'height': height + borders['top'] + borders['bottom'],
+            })
+
+        return result
+
     def get_opened(self):
         """Get all the open windows."""
-        opened, _, _ = run_command('wmctrl -l | cut -f 1 -d \ ')
-        return opened.split()
+        return self.index(refresh=True).hwnds()
 
     def get_pid_by_hwnd(self, hwnd):
-        pid, _, _ = run_command('wmctrl -l -p | grep {} | cut -f 4 -d \ '.format(hwnd))
-        return int(pid)
+        hwnd = self.__hwnd2int(hwnd)
+        return self.lookup(lambda index: index.pid(hwnd))
+
+    def index(self, refresh=False):
+        # Пока работает наблюдатель, индекс устаревает только при изменении списка окон.
+        if self.__watch_opened():
+            serial = self.__opened_serial
+
+            if serial != self.__index_serial:
+                refresh = True
+                self.__index_serial = serial
+
+        return super().index(refresh)
 
     def is_exists(self, hwnd):
-        _, _, code = run_command('wmctrl -l | grep {}'.format(self.__hwnd2hex(hwnd)))
-        return code == 0
+        if hwnd is None:
+            return False
+
+        hwnd = self.__hwnd2int(hwnd)
+        return self.lookup(lambda index: hwnd in index)
+
+    def is_maximized(self, hwnd):
+        return bool(self.__properties(self.__hwnd2int(hwnd))[1] & MAXIMIZED)
 
     def move(self, hwnd, x, y, width, height):
+        self.unmaximize(hwnd)
+
         borders = self.borders(hwnd)
 
-        run_command('wmctrl -i -r {id} -b remove,maximized_vert,maximized_horz -e 0,{x},{y},{width},{height}'.format(
-            id=hwnd,
+        self.__run('wmctrl', '-i', '-r', str(self.__hwnd2int(hwnd)), '-e', '0,{x},{y},{width},{height}'.format(
             x=x,
             y=y,
             width=width - borders['left'] - borders['right'],
             height=height - borders['top'] - borders['bottom']
         ))
+
+    def stop_watchers(self):
+        """Завершает процессы xprop, следящие за окнами."""
+        with self.__lock:
+            watchers = [helper for helper, _ in self.__watchers.values()] + [self.__opened_watcher, self.__workarea_watcher]
+
+        for helper in watchers:
+            if helper is not None:
+                helper.close()
+
+    def unmaximize(self, hwnd):
+        hwnd = self.__hwnd2int(hwnd)
+
+        if not self.is_maximized(hwnd):
+            return
+
+        self.__run('wmctrl', '-i', '-r', str(hwnd), '-b', 'remove,maximized_vert,maximized_horz')
+
+        # Новое состояние и декорацию сообщит xprop, до этого считаем окно свернутым.
+        if hwnd in self.__cache:
+            self.__cache.set_state(hwnd, (self.__cache.state(hwnd) or frozenset()) - MAXIMIZED)
+
+    def watch_opened(self):
+        self.metrics().count('commands')
+
+        try:
+            return XpropOpenedWatcher()
+        except OSError:
+            return super().watch_opened()
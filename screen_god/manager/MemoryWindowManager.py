@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+
+from itertools import count
+from threading import RLock
+from time import sleep, time
+
+import psutil
+
+from screen_god.manager.index import WindowIndex
+from screen_god.manager.monitors import Monitor
+from screen_god.manager.WindowManager import WindowManager
+
+
+class MemoryWindowManager(WindowManager):
+    """
+    Менеджер окон, моделирующий окна, процессы и декорации в памяти.
+    Нужен для тестов и бенчмарков без рабочего стола.
+
+    latency - задержка в секундах каждой операции: число или словарь {операция: задержка}.
+    auto_map - создавать окно для каждого дочернего процесса не раньше, чем через
+    map_delay секунд после его запуска, как это сделало бы приложение с GUI.
+    monitors - список Monitor, по умолчанию один монитор 1920x1080.
+    """
+
+    def __init__(self, latency=0, borders=None, auto_map=True, map_delay=0, monitors=None):
+        self.latency = latency
+        self.auto_map = auto_map
+        self.map_delay = map_delay
+
+        self.__borders = dict(borders or {'left': 1, 'right': 1, 'top': 24, 'bottom': 1})
+        self.__ids = count(0x1000001)
+        self.__lock = RLock()
+        self.__windows = {}
+        self.__mapped_pids = set()
+        self.__monitors = list(monitors or [Monitor('default', 0, 0, 1920, 1080, True)])
+
+    def __delay(self, operation):
+        latency = self.latency.get(operation, 0) if isinstance(self.latency, dict) else self.latency
+
+        if latency:
+            sleep(latency)
+
+    def __geometry(self, hwnd):
+        window = self.__window(hwnd)
+
+        if window is None:
+            return None
+
+        borders = window['borders']
+
+        return {
+            'hwnd': hwnd,
+            'left': window['x'] - borders['left'],
+            'top': window['y'] - borders['top'],
+            'width': window['width'] + borders['left'] + borders['right'],
+            'height': window['height'] + borders['top'] + borders['bottom'],
+        }
+
+    def __map_children(self):
+        """Создает окна для дочерних процессов, которые их еще не получили."""
+        if not self.auto_map:
+            return
+
+        now = time()
+
+        for proc in psutil.Process().children(recursive=True):
+            try:
+                if proc.pid in self.__mapped_pids or now - proc.create_time() < self.map_delay:
+                    continue
+
+                name = proc.name()
+            except psutil.Error:
+                continue
+
+            self.__mapped_pids.add(proc.pid)
+            self.create_window(pid=proc.pid, title=name)
+
+    def __window(self, hwnd):
+        return self.__windows.get(hwnd)
+
+    def borders(self, hwnd):
+        self.__delay('borders')
+        window = self.__window(hwnd)
+
+        return dict(window['borders']) if window else dict.fromkeys(self.__borders, 0)
+
+    def build_index(self):
+        with self.__lock:
+            self.__map_children()
+            windows = [(hwnd, w['pid'], w['title']) for hwnd, w in self.__windows.items()]
+
+        return WindowIndex(windows)
+
+    def build_monitors(self):
+        self.__delay('build_monitors')
+        return list(self.__monitors)
+
+    def close(self, hwnd):
+        self.__delay('close')
+
+        with self.__lock:
+            self.__windows.pop(hwnd, None)
+
+    def create_window(self, pid=None, title='', x=0, y=0, width=640, height=480, maximized=False):
+        """Создает окно и возвращает его идентификатор. Размеры задаются без декорации."""
+        with self.__lock:
+            hwnd = next(self.__ids)
+
+            self.__windows[hwnd] = {
+                'pid': pid,
+                'title': title,
+                'x': x,
+                'y': y,
+                'width': width,
+                'height': height,
+                'borders': dict(self.__borders),
+                'maximized': maximized,
+            }
+
+        return hwnd
+
+    def find_by_mouse_click(self):
+        return None
+
+    def find_by_pid(self, pid):
+        self.__delay('find_by_pid')
+        hwnds = self.lookup(lambda index: index.by_pid(pid))
+        return hwnds[0] if hwnds else None
+
+    def find_by_title(self, title):
+        self.__delay('find_by_title')
+        hwnds = self.lookup(lambda index: index.by_title(title))
+        return hwnds[0] if hwnds else None
+
+    def geometry(self, hwnd):
+        """Returns without borders"""
+        self.__delay('geometry')
+        return self.__geometry(hwnd)
+
+    def geometry_many(self, hwnds):
+        self.__delay('geometry_many')
+        return [self.__geometry(hwnd) for hwnd in hwnds]
+
+    def get_opened(self):
+        """Get all the open windows."""
+        self.__delay('get_opened')
+        return self.index(refresh=True).hwnds()
+
+    def get_pid_by_hwnd(self, hwnd):
+        self.__delay('get_pid_by_hwnd')
+        window = self.__window(hwnd)
+        return window['pid'] if window else None
+
+    def is_exists(self, hwnd):
+        self.__delay('is_exists')
+        return hwnd in self.__windows
+
+    def is_maximized(self, hwnd):
+        window = self.__window(hwnd)
+        return bool(window and window['maximized'])
+
+    def monitors_events(self):
+        return True
+
+    def move(self, hwnd, x, y, width, height):
+        self.__delay('move')
+        window = self.__window(hwnd)
+
+        if window is None:
+            return
+
+        borders = window['borders']
+
+        window.update({
+            'x': x + borders['left'],
+            'y': y + borders['top'],
+            'width': width - borders['left'] - borders['right'],
+            'height': height - borders['top'] - borders['bottom'],
+            'maximized': False,
+        })
+
+    def set_monitors(self, monitors):
+        """Заменяет список мониторов, как при подключении или отключении дисплея."""
+        self.__monitors = list(monitors)
+        self.invalidate_monitors()
+
+    def unmaximize(self, hwnd):
+        window = self.__window(hwnd)
+
+        if window:
+            window['maximized'] = False
@@ -6,6 +6,7 @@ import win32gui
 import win32con
 import win32process
 
+from screen_god.manager.monitors import Monitor
 from screen_god.manager.WindowManager import WindowManager
 
 
@@ -23,6 +24,26 @@ class WinWindowManager(WindowManager):
         # print(win32gui.GetClientRect(hwnd))
         # print(win32gui.GetWindowRect(hwnd))
 
+    def build_monitors(self):
+        monitors = []
+
+        for handle, _, _ in win32api.EnumDisplayMonitors():
+            info = win32api.GetMonitorInfo(handle)
+            left, top, right, bottom = info['Monitor']
+            work_left, work_top, work_right, work_bottom = info['Work']
+
+            monitors.append(Monitor(
+                info['Device'],
+                left,
+                top,
+                right - left,
+                bottom - top,
+                bool(info['Flags'] & win32con.MONITORINFOF_PRIMARY),
+                (work_left, work_top, work_right - work_left, work_bottom - work_top)
+            ))
+
+        return monitors
+
     def close(self, hwnd):
         win32gui.SendMessage(hwnd, win32con.WM_SYSCOMMAND, win32con.SC_CLOSE, 0)
 
@@ -97,6 +118,31 @@ class WinWindowManager(WindowManager):
     def is_exists(self, hwnd):
         return bool(win32gui.IsWindow(hwnd))
 
+    def is_maximized(self, hwnd):
+        if not self.is_exists(hwnd):
+            return False
+
+        return win32gui.GetWindowPlacement(hwnd)[1] == win32con.SW_SHOWMAXIMIZED
+
     def move(self, hwnd, x, y, width, height):
         if self.is_exists(hwnd):
             win32gui.MoveWindow(hwnd, x, y, width, height, True)
+
+    def move_many(self, geometry):
+        geometry = [g for g in geometry if self.is_exists(g[0])]
+
+        if not geometry:
+            return
+
+        # Все окна перемещаются одной транзакцией и перерисовываются один раз.
+        hdwp = win32gui.BeginDeferWindowPos(len(geometry))
+        flags = win32con.SWP_NOZORDER | win32con.SWP_NOACTIVATE
+
+        for hwnd, x, y, width, height in geometry:
+            hdwp = win32gui.DeferWindowPos(hdwp, hwnd, 0, x, y, width, height, flags)
+
+        win32gui.EndDeferWindowPos(hdwp)
+
+    def unmaximize(self, hwnd):
+        if self.is_maximized(hwnd):
+            win32gui.ShowWindow(hwnd, win32con.SW_RESTORE)
@@ -1,11 +1,59 @@
 # -*- coding: utf-8 -*-
 
 import os.path as Path
-from time import sleep
+import warnings
+from time import monotonic, sleep
 
 import psutil
 
+from screen_god.manager.index import WindowIndex
+from screen_god.manager.monitors import find_monitor
 from screen_god.messages import t
+from screen_god.metrics import Metrics, instrument
+
+
+# Операции менеджера, для которых собираются метрики.
+INSTRUMENTED = (
+    'borders', 'build_index', 'build_monitors', 'close', 'find_by_mouse_click', 'find_by_pid', 'find_by_title',
+    'geometry', 'geometry_many', 'get_opened', 'get_pid_by_hwnd', 'is_exists', 'move', 'move_changed', 'move_many',
+    'Popen', 'Popen_many', 'unmaximize',
+)
+
+
+def instrument_methods(cls):
+    """Оборачивает операции из INSTRUMENTED, объявленные в классе cls."""
+    for name in INSTRUMENTED:
+        method = cls.__dict__.get(name)
+
+        if method is not None and not getattr(method, 'instrumented', False):
+            setattr(cls, name, instrument(name, method))
+
+
+def terminate(procs, timeout=1):
+    """Завершает процессы psutil.Popen вместе с потомками, не успевшие за timeout секунд убиваются."""
+    victims = []
+
+    for proc in procs:
+        try:
+            victims.extend(proc.children(recursive=True))
+        except psutil.Error:
+            pass
+
+        victims.append(proc)
+
+    for proc in victims:
+        try:
+            proc.terminate()
+        except psutil.Error:
+            pass
+
+    _, alive = psutil.wait_procs(victims, timeout)
+
+    for proc in alive:
+        try:
+            proc.kill()
+        except psutil.Error:
+            pass
 
 
 class NoSuchWindowException(Exception):
@@ -23,11 +71,153 @@ class NoSuchWindowException(Exception):
     __str__ = __repr__
 
 
+class Launch(object):
+    """Запущенный процесс, для которого ищется окно."""
+
+    def __init__(self, proc, shell=False):
+        self.proc = proc
+        self.shell = shell
+
+        try:
+            self.cmd = ' '.join(proc.cmdline())
+        except psutil.Error:
+            self.cmd = ''
+
+    def owns(self, p, own=True):
+        """
+        Проверяет, что процесс p, владеющий окном, запущен этим процессом (own=True)
+        или является другим экземпляром того же приложения (own=False).
+        """
+        proc = self.proc
+
+        try:
+            if own:
+                if p.pid == proc.pid:
+                    return True
+
+                return psutil.pid_exists(proc.pid) and p.pid in (c.pid for c in proc.children(recursive=True))
+
+            if self.shell:
+                name = Path.basename(' '.join(p.cmdline()))
+                return self.cmd.find(name) != -1
+
+            return p.name() == proc.name()
+        except psutil.Error:
+            return False
+
+
+class OpenedWatcher(object):
+    """
+    Наблюдатель за списком открытых окон.
+    Базовая реализация опрашивает список с интервалом poll_interval,
+    менеджеры с поддержкой событий возвращают свои реализации.
+    """
+
+    def __init__(self, poll_interval=0.1):
+        self.poll_interval = poll_interval
+
+    def close(self):
+        """Освобождает ресурсы наблюдателя."""
+
+    def fileno(self):
+        """Дескриптор, готовый к чтению при изменении списка окон, или None."""
+        return None
+
+    def wait(self, timeout):
+        """
+        Блокирует поток до изменения списка окон, но не дольше timeout секунд.
+        Возвращает True, если список мог измениться.
+        """
+        sleep(max(0, min(timeout, self.poll_interval)))
+        return True
+
+
+class MonitorWatcher(OpenedWatcher):
+    """
+    Наблюдатель за конфигурацией мониторов: wait() возвращает True, если она изменилась.
+    Менеджеры, получающие события об изменениях, увеличивают monitors_serial() сами,
+    для остальных список мониторов перечитывается раз в poll_interval секунд.
+    """
+
+    def __init__(self, manager, poll_interval=2.0):
+        super().__init__(poll_interval)
+        self.__manager = manager
+        self.__serial = manager.monitors_serial()
+
+    def wait(self, timeout):
+        deadline = monotonic() + timeout
+
+        while True:
+            if self.__manager.monitors_serial() != self.__serial:
+                self.__serial = self.__manager.monitors_serial()
+                return True
+
+            remaining = deadline - monotonic()
+
+            if remaining <= 0:
+                return False
+
+            super().wait(remaining)
+
+            if not self.__manager.monitors_events():
+                monitors = self.__manager.monitors()
+
+                if self.__manager.monitors(refresh=True) != monitors:
+                    self.__manager.invalidate_monitors()
+
+
+class WindowWatcher(OpenedWatcher):
+    """
+    Наблюдатель за перемещением, изменением размеров и закрытием окон hwnds.
+    wait() возвращает множество окон, которые могли измениться, пустое множество,
+    если за timeout ничего не произошло, или None, если проверить нужно все окна.
+    Базовая реализация не получает событий и раз в poll_interval секунд возвращает None.
+    """
+
+    def __init__(self, hwnds, poll_interval=1.0):
+        super().__init__(poll_interval)
+        self.hwnds = frozenset(hwnds)
+        self.__poll_at = monotonic() + poll_interval
+
+    def wait(self, timeout):
+        remaining = self.__poll_at - monotonic()
+
+        if remaining > timeout:
+            sleep(max(0, timeout))
+            return set()
+
+        sleep(max(0, remaining))
+        self.__poll_at = monotonic() + self.poll_interval
+
+        return None
+
+
 class WindowManager(object):
+    # Время в секундах, в течение которого индекс окон используется повторно.
+    index_ttl = 1.0
+
+    __index = None
+    __metrics = None
+    __monitors = None
+    __monitors_serial = 0
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        instrument_methods(cls)
+
     def borders(self, hwnd):
         """Возвращает размеры декорации окна."""
         raise NotImplementedError(t('abstract_method', method='WindowManager.borders()'))
 
+    def build_index(self):
+        """Перечисляет открытые окна и возвращает WindowIndex."""
+        windows = [(hwnd, self.get_pid_by_hwnd(hwnd), None) for hwnd in self.get_opened()]
+        return WindowIndex(windows)
+
+    def build_monitors(self):
+        """Перечисляет мониторы и возвращает список Monitor."""
+        raise NotImplementedError(t('abstract_method', method='WindowManager.build_monitors()'))
+
     def close(self, hwnd):
         """Закрыть указанное окно."""
         raise NotImplementedError(t('abstract_method', method='WindowManager.close()'))
@@ -44,6 +234,13 @@ class WindowManager(object):
         """Возвращает позицию и размеры окна относительно экрана."""
         raise NotImplementedError(t('abstract_method', method='WindowManager.geometry()'))
 
+    def geometry_many(self, hwnds):
+        """
+        Возвращает геометрию нескольких окон в формате geometry(), None - для несуществующих.
+        Реализации, умеющие пакетную обработку, должны переопределить метод.
+        """
+        return [self.geometry(hwnd) for hwnd in hwnds]
+
     def get_last_opened(self, opened):
         """Возвращает окна, открытые после переданных в аргументе opened."""
         return set(self.get_opened()) - set(opened)
@@ -55,50 +252,234 @@ class WindowManager(object):
     def get_pid_by_hwnd(self, hwnd):
         raise NotImplementedError(t('abstract_method', method='WindowManager.get_pid_by_hwnd()'))
 
+    def index(self, refresh=False):
+        """Возвращает индекс окон, перестраивая его по запросу или если он старше index_ttl."""
+        if refresh or self.__index is None or self.__index.age() > self.index_ttl:
+            self.__index = self.build_index()
+
+        return self.__index
+
+    def invalidate_monitors(self):
+        """Сбрасывает кэш мониторов, вызывается при изменении их конфигурации или рабочей области."""
+        self.__monitors = None
+        self.__monitors_serial += 1
+
     def is_exists(self, hwnd):
         """Возвращает True, если окно с указанным идентификатором существует."""
         raise NotImplementedError(t('abstract_method', method='WindowManager.is_exists()'))
 
+    def is_maximized(self, hwnd):
+        """Возвращает True, если окно развернуто на весь экран."""
+        return False
+
+    def lookup(self, getter):
+        """
+        Ищет в индексе окон с помощью функции getter(index).
+        Если ничего не найдено, индекс перестраивается и поиск повторяется.
+        """
+        result = getter(self.index())
+
+        if not result:
+            result = getter(self.index(refresh=True))
+
+        return result
+
+    def match_opened(self, opened, launches, pending):
+        """
+        Сопоставляет окна, открытые после opened, с процессами launches (список Launch).
+        pending - индексы процессов, для которых окно еще не найдено.
+        Возвращает список (i, hwnd, own), где own=False означает окно другого экземпляра приложения.
+        Проверенные окна добавляются в opened, найденные процессы удаляются из pending.
+        """
+        windows = []
+        found = []
+
+        for hwnd in self.get_last_opened(opened):
+            pid = self.get_pid_by_hwnd(hwnd)
+
+            if pid is None:
+                continue
+
+            # Чужие окна больше не проверяются.
+            opened.add(hwnd)
+
+            try:
+                windows.append((hwnd, psutil.Process(pid)))
+            except psutil.NoSuchProcess:
+                continue
+
+        # Сначала окна сопоставляются с запущенными процессами,
+        # затем оставшиеся - с другими экземплярами тех же приложений.
+        for own in (True, False):
+            for hwnd, p in list(windows):
+                for i in pending:
+                    if launches[i].owns(p, own):
+                        found.append((i, hwnd, own))
+                        pending.remove(i)
+                        windows.remove((hwnd, p))
+                        break
+
+        return found
+
+    def metrics(self):
+        """Возвращает метрики менеджера: количество и задержки операций, число команд и запросов."""
+        if self.__metrics is None:
+            self.__metrics = Metrics()
+
+        return self.__metrics
+
+    def monitor(self, name=None):
+        """Возвращает монитор по имени выхода (например, HDMI-1), без имени - основной."""
+        return find_monitor(self.monitors(), name)
+
+    def monitors(self, refresh=False):
+        """
+        Возвращает список мониторов из кэша. Кэш перестраивается по запросу
+        или после invalidate_monitors(), а не по времени.
+        """
+        if refresh or self.__monitors is None:
+            self.__monitors = self.build_monitors()
+
+        return list(self.__monitors)
+
+    def monitors_events(self):
+        """Возвращает True, если менеджер сам сбрасывает кэш мониторов по событиям."""
+        return False
+
+    def monitors_serial(self):
+        """Счетчик изменений конфигурации мониторов."""
+        return self.__monitors_serial
+
     def move(self, hwnd, x, y, width, height):
         """Изменяет размеры окна и перемещает его в указанную позицию."""
         raise NotImplementedError(t('abstract_method', method='WindowManager.move()'))
 
-    def Popen(self, cargs, attempts=10, shell=False, **kwargs):
-        """Каждая попытка выполняется раз в половину секунды."""
+    def move_changed(self, geometry, tolerance=0):
+        """
+        Аналог move_many(), который перемещает только окна, отличающиеся от нужной
+        геометрии больше чем на tolerance пикселей. Возвращает количество пропущенных окон.
+        """
+        geometry = list(geometry)
+
+        # Пустой план не требует запроса геометрии, в Linux это был бы лишний запуск xwininfo.
+        if not geometry:
+            return 0
+
+        current = self.geometry_many([hwnd for hwnd, *_ in geometry])
+        moves = []
+
+        for (hwnd, x, y, width, height), rect in zip(geometry, current):
+            if rect is None or max(
+                abs(rect['left'] - x), abs(rect['top'] - y),
+                abs(rect['width'] - width), abs(rect['height'] - height),
+            ) > tolerance:
+                moves.append((hwnd, x, y, width, height))
+
+        skipped = len(geometry) - len(moves)
+        self.metrics().count('moves_skipped', skipped)
+
+        if moves:
+            self.move_many(moves)
+
+        return skipped
+
+    def move_many(self, geometry):
+        """
+        Изменяет размеры и позиции нескольких окон.
+        geometry - последовательность кортежей (hwnd, x, y, width, height).
+        Реализации, умеющие пакетную обработку, должны переопределить метод.
+        """
+        for hwnd, x, y, width, height in geometry:
+            self.move(hwnd, x, y, width, height)
+
+    def Popen(self, cargs, attempts=None, shell=False, *, timeout=5, **kwargs):
+        """
+        Запускает процесс и ждет появления его окна не дольше timeout секунд.
+        Устаревший аргумент attempts задает timeout в попытках по полсекунды.
+        """
+
+        if attempts is not None:
+            warnings.warn(t('popen_attempts_deprecated'), DeprecationWarning, stacklevel=3)
+            timeout = attempts * 0.5
+
+        kwargs['shell'] = shell
+        hwnd, proc = self.Popen_many([(cargs, kwargs)], timeout)[0]
+
+        if hwnd is None:
+            raise NoSuchWindowException(t('started_process_without_gui'))
+
+        return hwnd, proc
+
+    def Popen_many(self, commands, timeout=5, callback=None):
+        """
+        Одновременно запускает несколько процессов и ждет появления их окон не дольше timeout секунд.
+        commands - последовательность кортежей (cargs, kwargs), kwargs передаются в psutil.Popen.
+        callback(i, hwnd, proc) вызывается, как только найдено окно i-го процесса.
+        Возвращает список (hwnd, proc) в порядке commands, hwnd равен None, если окно не появилось.
+        Если окно принадлежит другому экземпляру приложения, proc равен None.
+        """
+
+        # Наблюдатель создается до запуска, чтобы не пропустить быстро открывшееся окно.
+        watcher = self.watch_opened()
+
+        try:
+            opened = set(self.get_opened())
+            launches = []
+
+            try:
+                for cargs, kwargs in commands:
+                    kwargs = dict(kwargs)
+                    shell = kwargs.pop('shell', False)
+                    launches.append(Launch(psutil.Popen(cargs, shell=shell, **kwargs), shell))
+            except Exception:
+                # Уже запущенные процессы не должны пережить неудачный запуск.
+                terminate([launch.proc for launch in launches])
+                raise
+
+            results = [(None, launch.proc) for launch in launches]
+            pending = list(range(len(launches)))
+            started = monotonic()
+            deadline = started + timeout
+
+            while pending:
+                self.metrics().count('popen_attempts')
+
+                for i, hwnd, own in self.match_opened(opened, launches, pending):
+                    results[i] = (hwnd, launches[i].proc if own else None)
+
+                    if callback:
+                        callback(i, *results[i])
+
+                remaining = deadline - monotonic()
+
+                if not pending or remaining <= 0:
+                    break
 
-        opened = self.get_opened()
-        proc = psutil.Popen(cargs, shell=shell, **kwargs)
-        cmd = ' '.join(proc.cmdline())
+                watcher.wait(remaining)
 
-        def find(latest):
-            for hwnd in latest:
-                pid = self.get_pid_by_hwnd(hwnd)
-                p = psutil.Process(pid)
+            self.metrics().observe('popen_wait', monotonic() - started)
 
-                if shell:
-                    if psutil.pid_exists(proc.pid):
-                        for child in proc.children():
-                            if child.pid == p.pid:
-                                return hwnd, proc
+            if pending:
+                self.metrics().count('popen_timeouts', len(pending))
+        finally:
+            watcher.close()
 
-                    name = Path.basename(' '.join(p.cmdline()))
+        return results
 
-                    if cmd.find(name) != -1:
-                        return hwnd, None
-                else:
-                    if pid == proc.pid:
-                        return hwnd, proc
+    def unmaximize(self, hwnd):
+        """Восстанавливает обычный размер окна, если оно развернуто."""
 
-                    if p.name() == proc.name():
-                        return hwnd, None
+    def watch_monitors(self):
+        """Возвращает наблюдателя за изменением конфигурации мониторов (см. MonitorWatcher)."""
+        return MonitorWatcher(self)
 
-        while attempts:
-            result = find(self.get_last_opened(opened))
+    def watch_opened(self):
+        """Возвращает наблюдателя за появлением новых окон (см. OpenedWatcher)."""
+        return OpenedWatcher()
 
-            if result:
-                return result
+    def watch_windows(self, hwnds):
+        """Возвращает наблюдателя за изменением геометрии и закрытием окон hwnds (см. WindowWatcher)."""
+        return WindowWatcher(hwnds)
 
-            attempts -= 1
-            sleep(0.5)
 
-        raise NoSuchWindowException(t('started_process_without_gui'))
+instrument_methods(WindowManager)
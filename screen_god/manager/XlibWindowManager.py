@@ -0,0 +1,572 @@
+# -*- coding: utf-8 -*-
+
+import select
+from time import monotonic
+from weakref import WeakSet
+
+import psutil
+# Соединение используют несколько потоков (Enforcer, MoveScheduler, asyncio), поэтому python-xlib
+# должен защищать запросы и ответы блокировками. Модуль нужно импортировать до создания Display.
+import Xlib.threaded  # noqa: F401
+from Xlib import X, Xatom, error
+from Xlib.display import Display
+from Xlib.ext import randr
+from Xlib.protocol import event, request
+
+from screen_god.manager.cache import FrameCache
+from screen_god.manager.index import WindowIndex
+from screen_god.manager.monitors import Monitor
+from screen_god.manager.WindowManager import OpenedWatcher, WindowManager, WindowWatcher
+
+
+# Флаги _NET_MOVERESIZE_WINDOW: заданы x, y, width, height; источник - пейджер.
+MOVERESIZE_FLAGS = (1 << 8) | (1 << 9) | (1 << 10) | (1 << 11) | (2 << 12)
+
+# Действие _NET_WM_STATE: удалить состояние.
+NET_WM_STATE_REMOVE = 0
+
+BORDERS = ['left', 'right', 'top', 'bottom']
+
+# События RandR об изменении экрана, CRTC и выходов.
+RANDR_MASK = randr.RRScreenChangeNotifyMask | randr.RRCrtcChangeNotifyMask | randr.RROutputChangeNotifyMask
+
+
+def client_message_data(data):
+    """
+    Пять 32-битных значений ClientMessage. python-xlib упаковывает их как беззнаковые,
+    поэтому отрицательные координаты передаются в дополнительном коде.
+    """
+    return [value & 0xFFFFFFFF for value in (list(data) + [0] * 5)[:5]]
+
+
+def frame_extents(values):
+    """Размеры декорации из значений _NET_FRAME_EXTENTS, без свойства - нулевые."""
+    values = list(values or [])
+    return dict(zip(BORDERS, values if len(values) == 4 else [0] * 4))
+
+
+def property_value(value):
+    """
+    Данные поля value ответа GetProperty - кортежа (format, data) или None, если свойства нет.
+    Строки (format 8) возвращаются как bytes, числа - списком, отсутствующее свойство - пустым списком.
+    """
+    if value is None:
+        return []
+
+    fmt, data = value
+
+    return bytes(data) if fmt == 8 else list(data)
+
+
+def window_title(names):
+    """Заголовок окна из данных _NET_WM_NAME (UTF-8) и WM_NAME (Latin-1) или None."""
+    for value, encoding in zip(names, ('utf-8', 'latin-1')):
+        if value and isinstance(value, bytes):
+            return value.decode(encoding, 'replace')
+
+    return None
+
+
+class XlibOpenedWatcher(OpenedWatcher):
+    """
+    Ждет изменения _NET_CLIENT_LIST по событиям PropertyNotify корневого окна.
+    serial - другой счетчик изменений менеджера, например, monitors_serial.
+    """
+
+    def __init__(self, manager, serial=None):
+        super().__init__()
+        self.__manager = manager
+        self.__serial_of = serial or manager.opened_serial
+        self.__serial = self.__serial_of()
+
+    def fileno(self):
+        return self.__manager.display().fileno()
+
+    def wait(self, timeout):
+        deadline = monotonic() + timeout
+
+        while self.__serial_of() == self.__serial:
+            remaining = deadline - monotonic()
+
+            if remaining <= 0:
+                return False
+
+            self.__manager.wait_events(remaining)
+
+        self.__serial = self.__serial_of()
+
+        return True
+
+
+class XlibWindowWatcher(WindowWatcher):
+    """Собирает окна, получившие события ConfigureNotify и DestroyNotify."""
+
+    def __init__(self, manager, hwnds):
+        super().__init__(hwnds)
+        self.__manager = manager
+        self.__changed = set()
+
+    def fileno(self):
+        return self.__manager.display().fileno()
+
+    def notify(self, hwnd):
+        """Вызывается менеджером при событии окна hwnd."""
+        if hwnd in self.hwnds:
+            self.__changed.add(hwnd)
+
+    def wait(self, timeout):
+        deadline = monotonic() + timeout
+        self.__manager.wait_events(0)
+
+        while not self.__changed:
+            remaining = deadline - monotonic()
+
+            if remaining <= 0:
+                break
+
+            self.__manager.wait_events(remaining)
+
+        changed, self.__changed = self.__changed, set()
+
+        return changed
+
+
+class XlibWindowManager(WindowManager):
+    """Работает с X-сервером напрямую через одно постоянное соединение."""
+
+    def __init__(self, display=None):
+        self.__display = Display(display)
+        self.__root = self.__display.screen().root
+        self.__atoms = {}
+        self.__cache = FrameCache()
+        self.__opened_serial = 0
+        self.__index_serial = None
+        # Коды событий RandR или пустое множество, если расширение RandR 1.5 недоступно.
+        self.__randr_events = set()
+        self.__window_watchers = WeakSet()
+
+        self.__root.change_attributes(event_mask=X.PropertyChangeMask)
+
+        info = self.__display.query_extension(randr.extname)
+
+        if info is not None and hasattr(self.__root, 'xrandr_get_monitors'):
+            self.__randr_events = {info.first_event + randr.RRScreenChangeNotify, info.first_event + randr.RRNotify}
+            self.__root.xrandr_select_input(RANDR_MASK)
+
+        self.__display.flush()
+
+    def __atom(self, name):
+        atom = self.__atoms.get(name)
+
+        if atom is None:
+            self.metrics().count('x_requests')
+            atom = self.__display.intern_atom(name)
+            self.__atoms[name] = atom
+
+        return atom
+
+    def __client_message(self, hwnd, message_type, data):
+        ev = event.ClientMessage(
+            window=self.__window(hwnd),
+            client_type=self.__atom(message_type),
+            data=(32, client_message_data(data))
+        )
+
+        self.metrics().count('x_requests')
+        self.__root.send_event(ev, event_mask=X.SubstructureRedirectMask | X.SubstructureNotifyMask)
+
+    def __frame_extents(self, hwnds):
+        """
+        Возвращает размеры декорации окон из кэша.
+        Отсутствующие в кэше окна запрашиваются за один обмен с сервером,
+        после чего менеджер подписывается на изменения их свойств.
+        """
+        self.__process_events()
+
+        hwnds = [self.__hwnd2int(hwnd) for hwnd in hwnds]
+        missing = [hwnd for hwnd in dict.fromkeys(hwnds) if hwnd not in self.__cache]
+
+        if missing:
+            mask = X.PropertyChangeMask | X.StructureNotifyMask
+
+            self.metrics().count('x_requests', len(missing))
+
+            for hwnd in missing:
+                self.__window(hwnd).change_attributes(onerror=error.CatchError(), event_mask=mask)
+
+            requests = [(
+                self.__request_property(hwnd, '_NET_FRAME_EXTENTS', Xatom.CARDINAL, 4),
+                self.__request_property(hwnd, '_NET_WM_STATE', Xatom.ATOM, 32),
+            ) for hwnd in missing]
+
+            for hwnd, (extents, state) in zip(missing, requests):
+                extents = self.__reply_property(extents)
+                state = self.__reply_property(state)
+
+                # Окно уже уничтожено.
+                if extents is None or state is None:
+                    continue
+
+                # Отсутствующие свойства означают окно без декорации и без состояний.
+                self.__cache.set_borders(hwnd, frame_extents(extents))
+                self.__cache.set_state(hwnd, state)
+
+        return [self.__cache.borders(hwnd) or dict.fromkeys(BORDERS, 0) for hwnd in hwnds]
+
+    def __get_cardinals(self, hwnd, name, window=None, prop_type=Xatom.CARDINAL):
+        """
+        Числовое свойство окна списком или None. prop_type должен совпадать с типом свойства,
+        иначе сервер вернет пустое значение.
+        """
+        window = window or self.__window(hwnd)
+
+        self.metrics().count('x_requests')
+
+        try:
+            prop = window.get_full_property(self.__atom(name), prop_type)
+        except error.XError:
+            return None
+
+        return list(prop.value) if prop else None
+
+    def __handle_event(self, ev):
+        if ev.type in self.__randr_events:
+            self.invalidate_monitors()
+        elif ev.type == X.PropertyNotify and ev.window.id == self.__root.id:
+            if ev.atom == self.__atom('_NET_CLIENT_LIST'):
+                self.__opened_serial += 1
+            elif ev.atom in (self.__atom('_NET_WORKAREA'), self.__atom('_NET_CURRENT_DESKTOP')):
+                self.invalidate_monitors()
+        elif ev.type == X.PropertyNotify:
+            if ev.atom in (self.__atom('_NET_FRAME_EXTENTS'), self.__atom('_NET_WM_STATE')):
+                self.__cache.drop(ev.window.id)
+        elif ev.type == X.ConfigureNotify:
+            for watcher in list(self.__window_watchers):
+                watcher.notify(ev.window.id)
+        elif ev.type == X.DestroyNotify:
+            self.__cache.drop(ev.window.id)
+
+            for watcher in list(self.__window_watchers):
+                watcher.notify(ev.window.id)
+
+    def __hwnd2int(self, hwnd):
+        if isinstance(hwnd, int):
+            return hwnd
+
+        hwnd = str(hwnd)
+        return int(hwnd) if hwnd.isdigit() else int(hwnd, 16)
+
+    def __maximized_atoms(self):
+        return {self.__atom('_NET_WM_STATE_MAXIMIZED_VERT'), self.__atom('_NET_WM_STATE_MAXIMIZED_HORZ')}
+
+    def __process_events(self):
+        """Обрабатывает накопившиеся события без блокировки, возвращает их количество."""
+        count = 0
+
+        while self.__display.pending_events():
+            self.__handle_event(self.__display.next_event())
+            count += 1
+
+        return count
+
+    def __reply_property(self, req):
+        """Данные свойства из ответа на __request_property() или None, если окна нет."""
+        try:
+            req.reply()
+        except error.XError:
+            return None
+
+        return property_value(req.value)
+
+    def __request_property(self, hwnd, name, prop_type, length):
+        """Отправляет запрос GetProperty, не дожидаясь ответа."""
+        self.metrics().count('x_requests')
+
+        return request.GetProperty(
+            display=self.__display.display,
+            defer=True,
+            delete=False,
+            window=hwnd,
+            property=self.__atom(name),
+            type=prop_type,
+            long_offset=0,
+            long_length=length
+        )
+
+    def __unmaximize(self, hwnd):
+        self.__client_message(hwnd, '_NET_WM_STATE', [
+            NET_WM_STATE_REMOVE,
+            self.__atom('_NET_WM_STATE_MAXIMIZED_VERT'),
+            self.__atom('_NET_WM_STATE_MAXIMIZED_HORZ'),
+            2,
+        ])
+
+    def __workarea(self):
+        """Рабочая область текущего рабочего стола из _NET_WORKAREA или None."""
+        workarea = self.__get_cardinals(None, '_NET_WORKAREA', self.__root)
+
+        if not workarea or len(workarea) < 4:
+            return None
+
+        desktop = (self.__get_cardinals(None, '_NET_CURRENT_DESKTOP', self.__root) or [0])[0]
+
+        if len(workarea) < 4 * (desktop + 1):
+            desktop = 0
+
+        return tuple(workarea[4 * desktop:4 * desktop + 4])
+
+    def __window(self, hwnd):
+        return self.__display.create_resource_object('window', self.__hwnd2int(hwnd))
+
+    def borders(self, hwnd):
+        return self.__frame_extents([hwnd])[0]
+
+    def build_index(self):
+        hwnds = self.get_opened()
+
+        # Все свойства всех окон запрашиваются за один обмен с сервером.
+        requests = [(
+            self.__request_property(hwnd, '_NET_WM_PID', Xatom.CARDINAL, 1),
+            self.__request_property(hwnd, '_NET_WM_NAME', self.__atom('UTF8_STRING'), 1024),
+            self.__request_property(hwnd, 'WM_NAME', Xatom.STRING, 1024),
+        ) for hwnd in hwnds]
+
+        windows = []
+
+        for hwnd, (pid, *names) in zip(hwnds, requests):
+            pid = self.__reply_property(pid)
+            title = window_title([self.__reply_property(req) for req in names])
+            windows.append((hwnd, pid[0] if pid else None, title))
+
+        return WindowIndex(windows)
+
+    def build_monitors(self):
+        workarea = self.__workarea()
+        monitors = []
+
+        if self.__randr_events:
+            self.metrics().count('x_requests')
+
+            try:
+                reply = self.__root.xrandr_get_monitors(is_active=True)
+            except error.XError:
+                reply = None
+
+            for info in reply.monitors if reply else ():
+                monitors.append(Monitor(
+                    self.__display.get_atom_name(info.name),
+                    info.x,
+                    info.y,
+                    info.width_in_pixels,
+                    info.height_in_pixels,
+                    bool(info.primary),
+                    workarea
+                ))
+
+        if not monitors:
+            screen = self.__display.screen()
+            monitors.append(Monitor('default', 0, 0, screen.width_in_pixels, screen.height_in_pixels, True, workarea))
+
+        return monitors
+
+    def close(self, hwnd):
+        self.__client_message(hwnd, '_NET_CLOSE_WINDOW', [X.CurrentTime, 2])
+        self.__display.flush()
+
+    def display(self):
+        return self.__display
+
+    def find_by_mouse_click(self):
+        print('Please select window...')
+
+        status = self.__root.grab_pointer(
+            False, X.ButtonPressMask, X.GrabModeAsync, X.GrabModeAsync,
+            X.NONE, X.NONE, X.CurrentTime
+        )
+
+        if status != X.GrabSuccess:
+            return None
+
+        try:
+            while True:
+                ev = self.__display.next_event()
+
+                if ev.type == X.ButtonPress:
+                    break
+
+                self.__handle_event(ev)
+        finally:
+            self.__display.ungrab_pointer(X.CurrentTime)
+            self.__display.flush()
+
+        if not ev.child:
+            return None
+
+        # Под курсором находится рамка оконного менеджера, ищем внутри нее окно клиента.
+        opened = set(self.get_opened())
+        stack = [ev.child]
+
+        while stack:
+            window = stack.pop()
+
+            if window.id in opened:
+                return window.id
+
+            try:
+                stack.extend(window.query_tree().children)
+            except error.XError:
+                continue
+
+        return None
+
+    def find_by_pid(self, pid):
+        if not psutil.pid_exists(pid):
+            return None
+
+        hwnds = self.lookup(lambda index: index.by_pid(pid))
+        return hwnds[0] if hwnds else None
+
+    def find_by_title(self, title):
+        hwnds = self.lookup(lambda index: index.by_title(title))
+        return hwnds[0] if hwnds else None
+
+    def geometry(self, hwnd):
+        """Returns without borders"""
+        return self.geometry_many([hwnd])[0]
+
+    def geometry_many(self, hwnds):
+        hwnds = [self.__hwnd2int(hwnd) for hwnd in hwnds]
+        borders = self.__frame_extents(hwnds)
+
+        self.metrics().count('x_requests', 2 * len(hwnds))
+
+        # Запросы геометрии всех окон отправляются до чтения первого ответа.
+        requests = [(
+            request.GetGeometry(display=self.__display.display, defer=True, drawable=hwnd),
+            request.TranslateCoords(display=self.__display.display, defer=True,
+                                    src_wid=hwnd, dst_wid=self.__root, src_x=0, src_y=0),
+        ) for hwnd in hwnds]
+
+        result = []
+
+        for hwnd, (geom, coords), border in zip(hwnds, requests, borders):
+            try:
+                geom.reply()
+                coords.reply()
+            except error.XError:
+                result.append(None)
+                continue
+
+            result.append({
+                'hwnd': hwnd,
+                'left': coords.x - border['left'],
+                'top': coords.y - border['top'],
+                'width': geom.width + border['left'] + border['right'],
+                'height': geom.height + border['top'] + border['bottom'],
+            })
+
+        return result
+
+    def get_opened(self):
+        """Get all the open windows."""
+        return self.__get_cardinals(None, '_NET_CLIENT_LIST', self.__root, Xatom.WINDOW) or []
+
+    def get_pid_by_hwnd(self, hwnd):
+        hwnd = self.__hwnd2int(hwnd)
+        return self.lookup(lambda index: index.pid(hwnd))
+
+    def index(self, refresh=False):
+        # Индекс устаревает, как только меняется список окон.
+        serial = self.opened_serial()
+
+        if serial != self.__index_serial:
+            refresh = True
+            self.__index_serial = serial
+
+        return super().index(refresh)
+
+    def is_exists(self, hwnd):
+        if hwnd is None:
+            return False
+
+        hwnd = self.__hwnd2int(hwnd)
+        return self.lookup(lambda index: hwnd in index)
+
+    def is_maximized(self, hwnd):
+        self.__frame_extents([hwnd])
+        state = self.__cache.state(self.__hwnd2int(hwnd)) or frozenset()
+
+        return bool(state & self.__maximized_atoms())
+
+    def monitors(self, refresh=False):
+        # Кэш сбрасывается обработчиком событий RandR и изменений _NET_WORKAREA.
+        self.__process_events()
+        return super().monitors(refresh)
+
+    def monitors_events(self):
+        return True
+
+    def monitors_serial(self):
+        self.__process_events()
+        return super().monitors_serial()
+
+    def move(self, hwnd, x, y, width, height):
+        self.move_many([(hwnd, x, y, width, height)])
+
+    def move_many(self, geometry):
+        geometry = list(geometry)
+        borders = self.__frame_extents([hwnd for hwnd, *_ in geometry])
+
+        maximized = self.__maximized_atoms()
+
+        for (hwnd, x, y, width, height), border in zip(geometry, borders):
+            state = self.__cache.state(self.__hwnd2int(hwnd)) or frozenset()
+
+            if state & maximized:
+                self.__unmaximize(hwnd)
+
+            self.__client_message(hwnd, '_NET_MOVERESIZE_WINDOW', [
+                MOVERESIZE_FLAGS,
+                x,
+                y,
+                width - border['left'] - border['right'],
+                height - border['top'] - border['bottom'],
+            ])
+
+        self.__display.flush()
+
+    def opened_serial(self):
+        """Счетчик изменений _NET_CLIENT_LIST, увеличивается при открытии и закрытии окон."""
+        self.__process_events()
+        return self.__opened_serial
+
+    def unmaximize(self, hwnd):
+        if self.is_maximized(hwnd):
+            self.__unmaximize(hwnd)
+            self.__display.flush()
+
+    def wait_events(self, timeout):
+        """Ждет события X-сервера не дольше timeout секунд и обрабатывает их."""
+        if self.__process_events():
+            return
+
+        select.select([self.__display], [], [], max(0, timeout))
+        self.__process_events()
+
+    def watch_monitors(self):
+        return XlibOpenedWatcher(self, self.monitors_serial)
+
+    def watch_opened(self):
+        return XlibOpenedWatcher(self)
+
+    def watch_windows(self, hwnds):
+        hwnds = [self.__hwnd2int(hwnd) for hwnd in hwnds]
+
+        # Подписка на StructureNotify оформляется вместе с запросом декорации.
+        self.__frame_extents(hwnds)
+        self.__display.flush()
+
+        watcher = XlibWindowWatcher(self, hwnds)
+        self.__window_watchers.add(watcher)
+
+        return watcher
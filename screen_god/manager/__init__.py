@@ -1,31 +1,130 @@
 # -*- coding: utf-8 -*-
 
+"""
+Менеджер окон выбирается при первом обращении к WindowManager, а не при импорте пакета.
+Выбрать или подставить менеджер явно можно с помощью set_backend()
+или переменной окружения SCREEN_GOD_BACKEND (windows, xlib, wmctrl, memory).
+"""
+
+import os
 import platform
+import shutil
 import warnings
+from importlib.util import find_spec
+from threading import Lock
+
+# Модуль импортируется заранее: иначе при его импорте атрибут пакета WindowManager
+# был бы заменен модулем.
+from screen_god.manager.WindowManager import NoSuchWindowException
+from screen_god.manager.scheduler import MoveScheduler
+from screen_god.messages import t
+
+
+BACKENDS = ('windows', 'xlib', 'wmctrl', 'memory')
+
+
+def check_installed(package_name):
+    if shutil.which(package_name) is None:
+        warnings.warn('''I require "{}" but it's not installed.'''.format(package_name),
+                      stacklevel=2)
+
+
+def create_backend(name):
+    """Создает менеджер окон по имени."""
+    if name == 'windows':
+        from screen_god.manager.WinWindowManager import WinWindowManager
+        return WinWindowManager()
+
+    if name == 'xlib':
+        from screen_god.manager.XlibWindowManager import XlibWindowManager
+        return XlibWindowManager()
+
+    if name == 'wmctrl':
+        from screen_god.manager.LinuxWindowManager import LinuxWindowManager
+
+        check_installed('wmctrl')
+
+        return LinuxWindowManager()
+
+    if name == 'memory':
+        from screen_god.manager.MemoryWindowManager import MemoryWindowManager
+        return MemoryWindowManager()
+
+    raise ValueError(t('invalid_argument_value', name='backend'))
+
+
+def detect_backend():
+    """Возвращает имя подходящего менеджера окон, не запуская внешних процессов."""
+    name = os.environ.get('SCREEN_GOD_BACKEND')
+
+    if name:
+        return name
+
+    osname = platform.system()
+
+    if osname == 'Windows':
+        return 'windows'
+
+    if osname == 'Linux':
+        if os.environ.get('DISPLAY') and find_spec('Xlib') is not None:
+            return 'xlib'
+        return 'wmctrl'
+
+    if osname == 'Darwin':
+        raise RuntimeError('MacOS is not yet supported')
+
+    raise RuntimeError('Your platform is not supported')
+
+
+class WindowManagerProxy(object):
+    """Заместитель менеджера окон, создающий его при первом обращении."""
+
+    def __init__(self):
+        self.__backend = None
+        self.__lock = Lock()
+
+    def __getattr__(self, name):
+        return getattr(self.get_backend(), name)
+
+    def __repr__(self):
+        return '<WindowManagerProxy {!r}>'.format(self.__backend)
+
+    def get_backend(self):
+        backend = self.__backend
+
+        if backend is not None:
+            return backend
 
-from screen_god.common import run_command
+        with self.__lock:
+            if self.__backend is None:
+                name = detect_backend()
 
+                try:
+                    self.__backend = create_backend(name)
+                except Exception:
+                    # Нет python-xlib или не удалось подключиться к X-серверу.
+                    if name != 'xlib' or 'SCREEN_GOD_BACKEND' in os.environ:
+                        raise
 
-osname = platform.system()
+                    self.__backend = create_backend('wmctrl')
 
-if osname == 'Windows':
-    from screen_god.manager.WinWindowManager import WinWindowManager
+            return self.__backend
 
-    WindowManager = WinWindowManager()
-elif osname == 'Linux':
-    from screen_god.manager.LinuxWindowManager import LinuxWindowManager
+    def set_backend(self, backend):
+        """
+        Задает менеджер окон: экземпляр WindowManager, его класс или имя из BACKENDS.
+        None сбрасывает выбор, и менеджер снова будет выбран при первом обращении.
+        """
+        if isinstance(backend, str):
+            backend = create_backend(backend)
+        elif isinstance(backend, type):
+            backend = backend()
 
-    def check_installed(package_name):
-        _, _, code = run_command('which {}'.format(package_name))
+        with self.__lock:
+            self.__backend = backend
 
-        if code:
-            warnings.warn('''I require "{}" but it's not installed.'''.format(package_name),
-                          stacklevel=2)
 
-    check_installed('wmctrl')
+WindowManager = WindowManagerProxy()
 
-    WindowManager = LinuxWindowManager()
-elif osname == 'Darwin':
-    raise ImportError('MacOS is not yet supported')
-else:
-    raise ImportError('Your platform is not supported')
+get_backend = WindowManager.get_backend
+set_backend = WindowManager.set_backend
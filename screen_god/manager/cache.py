@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+
+from threading import Lock
+
+
+class FrameCache(object):
+    """
+    Кэш размеров декорации и состояния (_NET_WM_STATE) окон.
+    Записи обновляются и сбрасываются менеджером по событиям X-сервера.
+    """
+
+    def __init__(self):
+        self.__lock = Lock()
+        self.__borders = {}
+        self.__states = {}
+
+    def __contains__(self, hwnd):
+        return hwnd in self.__borders
+
+    def borders(self, hwnd):
+        """Возвращает размеры декорации или None, если их нет в кэше."""
+        return self.__borders.get(hwnd)
+
+    def drop(self, hwnd):
+        """Удаляет все сведения об окне, например, после его уничтожения."""
+        with self.__lock:
+            self.__borders.pop(hwnd, None)
+            self.__states.pop(hwnd, None)
+
+    def hwnds(self):
+        return list(self.__borders)
+
+    def set_borders(self, hwnd, borders):
+        with self.__lock:
+            self.__borders[hwnd] = borders
+
+    def set_state(self, hwnd, state):
+        with self.__lock:
+            self.__states[hwnd] = frozenset(state)
+
+    def state(self, hwnd):
+        """Возвращает множество атомов _NET_WM_STATE или None, если состояние неизвестно."""
+        return self.__states.get(hwnd)
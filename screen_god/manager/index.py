@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+
+from time import monotonic
+
+
+class WindowIndex(object):
+    """
+    Индекс открытых окон, построенный за одно перечисление:
+    hwnd -> pid, pid -> [hwnd], заголовок -> [hwnd] и множество существующих окон.
+    """
+
+    def __init__(self, windows=()):
+        """windows - последовательность кортежей (hwnd, pid, title) в порядке открытия."""
+        self.__created = monotonic()
+        self.__hwnds = []
+        self.__pids = {}
+        self.__by_pid = {}
+        self.__by_title = {}
+
+        for hwnd, pid, title in windows:
+            self.__hwnds.append(hwnd)
+            self.__pids[hwnd] = pid
+            self.__by_pid.setdefault(pid, []).append(hwnd)
+            self.__by_title.setdefault(title, []).append(hwnd)
+
+    def __contains__(self, hwnd):
+        return hwnd in self.__pids
+
+    def __iter__(self):
+        return iter(self.__hwnds)
+
+    def __len__(self):
+        return len(self.__hwnds)
+
+    def age(self):
+        """Возвращает время в секундах, прошедшее с построения индекса."""
+        return monotonic() - self.__created
+
+    def by_pid(self, pid):
+        return list(self.__by_pid.get(pid, ()))
+
+    def by_title(self, title):
+        return list(self.__by_title.get(title, ()))
+
+    def hwnds(self):
+        return list(self.__hwnds)
+
+    def pid(self, hwnd):
+        return self.__pids.get(hwnd)
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+
+from screen_god.messages import t
+
+
+def clip(rect, area):
+    """Пересечение прямоугольников (x, y, width, height) или rect, если они не пересекаются."""
+    x, y = max(rect[0], area[0]), max(rect[1], area[1])
+    right = min(rect[0] + rect[2], area[0] + area[2])
+    bottom = min(rect[1] + rect[3], area[1] + area[3])
+
+    if right <= x or bottom <= y:
+        return tuple(rect)
+
+    return x, y, right - x, bottom - y
+
+
+def find_monitor(monitors, name=None):
+    """Возвращает монитор с именем name, а без имени - основной или первый."""
+    for monitor in monitors:
+        if monitor.name == name or (name is None and monitor.primary):
+            return monitor
+
+    if name is None and monitors:
+        return monitors[0]
+
+    raise LookupError(t('monitor_not_found', name=name))
+
+
+class Monitor(object):
+    """
+    Монитор (выход RandR): имя, прямоугольник на экране и рабочая область.
+    Рабочая область - часть монитора без панелей (_NET_WORKAREA), по умолчанию весь монитор.
+    """
+
+    def __init__(self, name, x, y, width, height, primary=False, workarea=None):
+        self.name = name
+        self.rect = (x, y, width, height)
+        self.primary = primary
+        self.workarea = self.rect if workarea is None else clip(self.rect, workarea)
+
+    def __eq__(self, other):
+        return isinstance(other, Monitor) and (self.name, self.rect, self.primary, self.workarea) == (
+            other.name, other.rect, other.primary, other.workarea
+        )
+
+    def __repr__(self):
+        return '<Monitor {} {}x{}+{}+{}{}>'.format(
+            self.name, self.rect[2], self.rect[3], self.rect[0], self.rect[1], ' primary' if self.primary else ''
+        )
@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+
+import logging
+from concurrent.futures import Future
+from threading import Condition, Thread
+from time import monotonic
+
+from screen_god.messages import t
+
+
+logger = logging.getLogger(__name__)
+
+
+class MoveScheduler(object):
+    """
+    Объединяет частые запросы на перемещение окон, например, при перетаскивании разделителя.
+
+    Для каждого окна хранится только последняя запрошенная геометрия. Накопленные запросы
+    выполняются одним вызовом move_changed() в отдельном потоке не чаще fps раз в секунду,
+    а с fps=None - после idle секунд без новых запросов. submit() возвращает
+    concurrent.futures.Future с количеством перемещенных окон, который завершается после
+    выполнения пакета; в asyncio его можно ожидать через asyncio.wrap_future().
+    Ошибка перемещения передается в Future пакета и записывается в журнал, а поток продолжает
+    работу. Обращения к X-серверу из этого потока безопасны, так как XlibWindowManager
+    использует Xlib.threaded.
+    """
+
+    def __init__(self, manager=None, fps=60, idle=0.05, tolerance=0):
+        self.fps = fps
+        self.idle = idle
+        self.tolerance = tolerance
+
+        self.__manager = manager
+        self.__cond = Condition()
+        self.__pending = {}
+        self.__future = None
+        # Future пакета, который выполняется в данный момент.
+        self.__running = None
+        self.__requests = 0
+        self.__submitted = 0
+        self.__flushed = 0
+        self.__force = False
+        self.__closed = False
+        self.__thread = None
+
+    def __due(self):
+        """Время, когда накопленные запросы нужно выполнить."""
+        if self.__force:
+            return 0
+
+        if self.fps:
+            return self.__flushed + 1 / self.fps
+
+        return self.__submitted + self.idle
+
+    def __loop(self):
+        while True:
+            with self.__cond:
+                while not self.__pending and not self.__closed:
+                    self.__cond.wait()
+
+                if not self.__pending:
+                    return
+
+                remaining = self.__due() - monotonic()
+
+                while remaining > 0 and not self.__closed:
+                    self.__cond.wait(remaining)
+                    remaining = self.__due() - monotonic()
+
+                batch, future, requests = list(self.__pending.values()), self.__future, self.__requests
+                self.__pending, self.__future, self.__requests, self.__force = {}, None, 0, False
+                self.__running = future
+
+            self.__move(batch, future, requests)
+
+            with self.__cond:
+                self.__running = None
+
+    def __move(self, batch, future, requests):
+        # Отмененный Future не принимает результат, но окна все равно перемещаются.
+        running = future.set_running_or_notify_cancel()
+
+        try:
+            manager = self.manager()
+            skipped = manager.move_changed(batch, self.tolerance)
+            manager.metrics().count('moves_coalesced', requests - len(batch))
+        except Exception as e:
+            logger.exception(t('scheduler_move_failed', count=len(batch)))
+
+            if running:
+                future.set_exception(e)
+        else:
+            if running:
+                future.set_result(len(batch) - skipped)
+        finally:
+            self.__flushed = monotonic()
+
+    def close(self, timeout=None):
+        """Выполняет накопленные запросы и останавливает поток."""
+        with self.__cond:
+            self.__closed = True
+            self.__cond.notify()
+
+        if self.__thread is not None:
+            self.__thread.join(timeout)
+
+    def flush(self, timeout=None):
+        """Выполняет накопленные запросы немедленно и возвращает количество перемещенных окон."""
+        with self.__cond:
+            future = self.__future or self.__running
+
+            if future is None:
+                return 0
+
+            self.__force = True
+            self.__cond.notify()
+
+        return future.result(timeout)
+
+    def manager(self):
+        if self.__manager is None:
+            from screen_god.manager import WindowManager
+            return WindowManager
+
+        return self.__manager
+
+    def pending(self):
+        """Количество окон, ожидающих перемещения."""
+        return len(self.__pending)
+
+    def submit(self, geometry):
+        """
+        Добавляет запросы (hwnd, x, y, width, height), заменяя еще не выполненные запросы тех же окон.
+        Возвращает Future ближайшего пакета.
+        """
+        with self.__cond:
+            if self.__closed:
+                raise RuntimeError(t('scheduler_closed'))
+
+            # Отмененный Future одного вызывающего не должен отменять ожидание остальных.
+            if self.__future is None or self.__future.cancelled():
+                self.__future = Future()
+
+            for item in geometry:
+                self.__pending[item[0]] = item
+                self.__requests += 1
+
+            self.__submitted = monotonic()
+            future = self.__future
+
+            if self.__thread is None:
+                self.__thread = Thread(target=self.__loop, daemon=True)
+                self.__thread.start()
+
+            self.__cond.notify()
+
+            # Пустой запрос ничего не ждет.
+            if not self.__pending:
+                self.__future = None
+                future.set_result(0)
+
+        return future
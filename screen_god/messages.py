@@ -2,11 +2,17 @@
 
 __messages = {
     'abstract_method': '{method} is abstract and must be overridden.',
+    'enforcer_failed': 'Enforcer pass failed, restarting in {interval} s.',
+    'grid_is_full': 'The grid has no free cells, capacity is {capacity}.',
     'incompatible_type_argument': 'Incompatible type of the argument "{name}". Expected type "{type}".',
     'invalid_argument_value': 'Invalid argument value "{name}".',
-    'invalid_units': 'Invalid units - "{unit}". Layout uses "{layout_unit}".',
+    'monitor_not_found': 'Monitor "{name}" not found.',
+    'popen_attempts_deprecated': 'The "attempts" argument is deprecated, pass "timeout" in seconds instead.',
     'property_calculated_automatically': 'The property will be calculated automatically.',
+    'scheduler_closed': 'The move scheduler is closed.',
+    'scheduler_move_failed': 'Failed to move {count} scheduled windows.',
     'started_process_without_gui': 'You have started the process without a GUI.',
+    'unsupported_layout_format': 'Unsupported layout file format "{ext}".',
     'window_not_set': 'The window is not set.',
 }
 
@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+
+from bisect import bisect_left
+from functools import wraps
+from threading import Event, Lock, Thread
+from time import perf_counter, time
+
+
+# Верхние границы интервалов гистограммы задержек в секундах.
+LATENCY_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, float('inf'))
+
+
+class Histogram(object):
+    """Гистограмма с фиксированными интервалами, а также количество, сумма, минимум и максимум."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.__buckets = tuple(buckets)
+        self.__counts = [0] * len(self.__buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, value):
+        self.__counts[bisect_left(self.__buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.min = value if self.min is None or value < self.min else self.min
+        self.max = value if self.max is None or value > self.max else self.max
+
+    def snapshot(self):
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'min': self.min,
+            'max': self.max,
+            'buckets': list(zip(self.__buckets, self.__counts)),
+        }
+
+
+class Metrics(object):
+    """
+    Счетчики и гистограммы задержек операций менеджера окон.
+    Сбор можно отключить, установив enabled = False.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.enabled = True
+        self.__buckets = buckets
+        self.__lock = Lock()
+        self.__counters = {}
+        self.__histograms = {}
+        self.__export = None
+
+    def count(self, name, n=1):
+        """Увеличивает счетчик name на n."""
+        if self.enabled:
+            with self.__lock:
+                self.__counters[name] = self.__counters.get(name, 0) + n
+
+    def observe(self, name, seconds):
+        """Добавляет задержку операции name в ее гистограмму."""
+        if not self.enabled:
+            return
+
+        with self.__lock:
+            histogram = self.__histograms.get(name)
+
+            if histogram is None:
+                histogram = self.__histograms[name] = Histogram(self.__buckets)
+
+            histogram.observe(seconds)
+
+    def reset(self):
+        with self.__lock:
+            self.__counters = {}
+            self.__histograms = {}
+
+    def snapshot(self):
+        """Возвращает копию собранных данных в виде словаря."""
+        with self.__lock:
+            return {
+                'time': time(),
+                'counters': dict(self.__counters),
+                'latency': {name: h.snapshot() for name, h in self.__histograms.items()},
+            }
+
+    def start_export(self, interval, callback, reset=False):
+        """
+        Раз в interval секунд передает snapshot() в callback в отдельном потоке.
+        С reset=True данные сбрасываются после каждой выгрузки.
+        """
+        self.stop_export()
+
+        stopped = Event()
+
+        def export():
+            while not stopped.wait(interval):
+                callback(self.snapshot())
+
+                if reset:
+                    self.reset()
+
+        self.__export = stopped
+        Thread(target=export, daemon=True).start()
+
+    def stop_export(self):
+        if self.__export is not None:
+            self.__export.set()
+            self.__export = None
+
+    def timer(self, name):
+        """Контекстный менеджер, измеряющий задержку блока кода."""
+        return Timer(self, name)
+
+
+class Timer(object):
+    def __init__(self, metrics, name):
+        self.__metrics = metrics
+        self.__name = name
+        self.__start = None
+
+    def __enter__(self):
+        self.__start = perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.__metrics.observe(self.__name, perf_counter() - self.__start)
+
+
+def instrument(name, method):
+    """Оборачивает метод менеджера окон, учитывая количество вызовов и задержку."""
+
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        metrics = self.metrics()
+
+        if not metrics.enabled:
+            return method(self, *args, **kwargs)
+
+        start = perf_counter()
+
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            metrics.observe(name, perf_counter() - start)
+
+    wrapper.instrumented = True
+
+    return wrapper
@@ -0,0 +1,509 @@
+# -*- coding: utf-8 -*-
+
+"""
+Чтение вывода запущенных процессов.
+
+Каналы stdout и stderr всех процессов обслуживает один поток ввода-вывода (Reactor),
+который ждет готовности каналов с помощью selectors и читает их большими фрагментами.
+Строки передаются обработчикам пачками через ограниченные очереди (HandlerQueue),
+а обработчики вызывает пул потоков (Dispatcher), в котором каждую очередь в любой момент
+обслуживает не больше одного потока. Медленный обработчик занимает только один поток пула
+и задерживает только свою очередь; с политикой BLOCK ждет лишь процесс, чей вывод он обрабатывает.
+Вспомогательные процессы библиотеки используют отдельный диспетчер (Dispatcher.internal()),
+чтобы обработчики пользователя не задерживали их.
+
+Если очередь заполнена, поведение определяет политика переполнения:
+    BLOCK - канал не читается, пока обработчик не освободит место
+    (процесс блокируется на записи в канал);
+    DROP_NEW - новые строки отбрасываются;
+    DROP_OLD - отбрасываются самые старые строки очереди.
+
+Обработчик - объект с методом execute(line); если у него есть метод execute_many(lines),
+пачка строк передается ему целиком.
+"""
+
+import os
+import selectors
+from collections import deque
+from threading import Condition, Lock, Thread
+
+from screen_god.messages import t
+from screen_god.metrics import Metrics
+
+
+BLOCK = 'block'
+DROP_NEW = 'drop_new'
+DROP_OLD = 'drop_old'
+
+OVERFLOW_POLICIES = (BLOCK, DROP_NEW, DROP_OLD)
+
+# Размер фрагмента, читаемого из канала за один вызов.
+CHUNK_SIZE = 65536
+
+# Наибольшее количество потоков диспетчера, как у concurrent.futures.ThreadPoolExecutor.
+DISPATCHER_WORKERS = min(32, (os.cpu_count() or 1) + 4)
+
+# Сколько секунд простаивающий поток диспетчера ждет работы, прежде чем завершиться.
+WORKER_IDLE_TIMEOUT = 5
+
+
+def read_chunk(stream, size=CHUNK_SIZE):
+    """Читает из stream то, что уже доступно, но не больше size байтов; b'' - конец потока."""
+    try:
+        fileno = stream.fileno()
+    except (AttributeError, OSError, ValueError):
+        stream = getattr(stream, 'buffer', stream)
+        return stream.read1(size) if hasattr(stream, 'read1') else stream.read(size)
+
+    try:
+        return os.read(fileno, size)
+    except OSError:
+        # Канал уже закрыт.
+        return b''
+
+
+class Dispatcher(object):
+    """
+    Пул потоков, передающих обработчикам пачки строк из очередей HandlerQueue.
+    Очередь планируется не больше одного раза, поэтому ее обработчик не вызывается параллельно.
+    Потоки запускаются по мере необходимости, но не больше max_workers, и завершаются после простоя.
+    """
+
+    __default = None
+    __internal = None
+    __default_lock = Lock()
+
+    def __init__(self, max_workers=None):
+        self.max_workers = max_workers or DISPATCHER_WORKERS
+
+        self.__cond = Condition()
+        self.__ready = deque()
+        self.__workers = 0
+        self.__idle = 0
+
+    def __work(self):
+        while True:
+            with self.__cond:
+                self.__idle += 1
+                self.__cond.wait_for(lambda: self.__ready, WORKER_IDLE_TIMEOUT)
+                self.__idle -= 1
+
+                if not self.__ready:
+                    self.__workers -= 1
+                    return
+
+                queue = self.__ready.popleft()
+
+            # Очередь с оставшимися строками встает в конец, чтобы не задерживать остальные.
+            if queue.run():
+                self.schedule(queue)
+
+    @classmethod
+    def default(cls):
+        """Общий диспетчер процесса."""
+        with cls.__default_lock:
+            if cls.__default is None:
+                cls.__default = cls()
+
+            return cls.__default
+
+    @classmethod
+    def internal(cls):
+        """
+        Диспетчер вспомогательных процессов библиотеки, отдельный от обработчиков пользователя.
+        Их обработчики только обновляют кэши, поэтому хватает одного потока.
+        """
+        with cls.__default_lock:
+            if cls.__internal is None:
+                cls.__internal = cls(max_workers=1)
+
+            return cls.__internal
+
+    def schedule(self, queue):
+        with self.__cond:
+            self.__ready.append(queue)
+
+            # Свободные потоки заняты, а предел еще не достигнут.
+            if len(self.__ready) > self.__idle and self.__workers < self.max_workers:
+                self.__workers += 1
+                Thread(target=self.__work, daemon=True).start()
+
+            self.__cond.notify()
+
+    def workers(self):
+        """Количество запущенных потоков."""
+        return self.__workers
+
+
+class HandlerQueue(object):
+    """
+    Ограниченная очередь строк для обработчика, который вызывается диспетчером Dispatcher.
+    maxsize - максимальное количество строк в очереди, overflow - политика переполнения.
+    Счетчики lines, batches, dropped, blocked и errors (исключения обработчика) записываются в metrics.
+    """
+
+    def __init__(self, handler, maxsize=10000, overflow=BLOCK, metrics=None, dispatcher=None):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(t('invalid_argument_value', name='overflow'))
+
+        self.maxsize = maxsize
+        self.overflow = overflow
+
+        self.__handler = handler
+        self.__execute_many = getattr(handler, 'execute_many', None)
+        self.__metrics = metrics or Metrics()
+        self.__dispatcher = dispatcher or Dispatcher.default()
+        self.__cond = Condition()
+        self.__batches = deque()
+        self.__size = 0
+        self.__scheduled = False
+        self.__paused = False
+        self.__closed = False
+        self.__done = False
+        self.__on_drain = None
+        self.__on_done = None
+
+    def __drop_old(self, count):
+        """Освобождает место для count строк, отбрасывая самые старые."""
+        while self.__batches and self.__size + count > self.maxsize:
+            batch = self.__batches[0]
+            drop = min(len(batch), self.__size + count - self.maxsize)
+
+            del batch[:drop]
+            self.__size -= drop
+            self.__metrics.count('dropped', drop)
+
+            if not batch:
+                self.__batches.popleft()
+
+    def __finish(self):
+        """
+        Снимает очередь с диспетчера, вызывается под блокировкой, когда пачек больше нет.
+        Возвращает True, если закрытая очередь только что передала обработчику все строки.
+        """
+        self.__scheduled = False
+
+        if self.__closed and not self.__done:
+            self.__done = True
+            self.__cond.notify_all()
+            return True
+
+        return False
+
+    def __notify_done(self, done):
+        if done and self.__on_done is not None:
+            self.__on_done()
+
+    def close(self):
+        """Отмечает конец потока: оставшиеся строки все равно будут переданы обработчику."""
+        done = False
+
+        with self.__cond:
+            self.__closed = True
+
+            if not self.__scheduled:
+                done = self.__finish()
+
+            self.__cond.notify_all()
+
+        self.__notify_done(done)
+
+    def join(self, timeout=None):
+        """Ждет, пока обработчик получит все строки закрытой очереди. Возвращает False по истечении timeout."""
+        with self.__cond:
+            return self.__cond.wait_for(lambda: self.__done, timeout)
+
+    def metrics(self):
+        return self.__metrics
+
+    def put(self, lines):
+        """
+        Добавляет пачку строк в очередь с учетом политики переполнения.
+        Возвращает False, если с политикой BLOCK очередь заполнена и чтение нужно приостановить.
+        """
+        lines = list(lines)
+
+        if not lines:
+            return not self.__paused
+
+        self.__metrics.count('lines', len(lines))
+
+        with self.__cond:
+            if self.overflow == DROP_NEW:
+                free = max(self.maxsize - self.__size, 0)
+
+                if free < len(lines):
+                    self.__metrics.count('dropped', len(lines) - free)
+                    lines = lines[:free]
+            elif self.overflow == DROP_OLD:
+                if len(lines) > self.maxsize:
+                    self.__metrics.count('dropped', len(lines) - self.maxsize)
+                    lines = lines[len(lines) - self.maxsize:]
+
+                self.__drop_old(len(lines))
+
+            # С политикой BLOCK пачка принимается целиком, а чтение приостанавливается
+            # до освобождения места, поэтому очередь превышает maxsize не больше чем на один фрагмент.
+            if lines:
+                self.__batches.append(lines)
+                self.__size += len(lines)
+
+            if self.overflow == BLOCK and self.__size >= self.maxsize and not self.__paused:
+                self.__paused = True
+                self.__metrics.count('blocked')
+
+            schedule = bool(self.__batches) and not self.__scheduled
+            self.__scheduled = self.__scheduled or schedule
+            paused = self.__paused
+
+        if schedule:
+            self.__dispatcher.schedule(self)
+
+        return not paused
+
+    def qsize(self):
+        """Количество строк в очереди."""
+        return self.__size
+
+    def run(self):
+        """
+        Передает обработчику одну пачку строк, вызывается диспетчером.
+        Возвращает True, если в очереди остались строки.
+        """
+        with self.__cond:
+            if not self.__batches:
+                done = self.__finish()
+                batch = None
+            else:
+                batch = self.__batches.popleft()
+                self.__size -= len(batch)
+                drained = self.__paused and self.__size < self.maxsize
+
+                if drained:
+                    self.__paused = False
+                    self.__cond.notify_all()
+
+        if batch is None:
+            self.__notify_done(done)
+            return False
+
+        try:
+            if self.__execute_many is not None:
+                self.__execute_many(batch)
+            else:
+                for line in batch:
+                    self.__handler.execute(line)
+        except Exception:
+            # Ошибка обработчика не должна останавливать очередь и вместе с ней процесс.
+            self.__metrics.count('errors')
+
+        self.__metrics.count('batches')
+
+        if drained and self.__on_drain is not None:
+            self.__on_drain()
+
+        with self.__cond:
+            if self.__batches:
+                return True
+
+            done = self.__finish()
+
+        self.__notify_done(done)
+        return False
+
+    def set_on_drain(self, callback):
+        """callback() вызывается, когда в приостановленной очереди освобождается место."""
+        self.__on_drain = callback
+
+    def set_on_done(self, callback):
+        """callback() вызывается, когда обработчик получил все строки закрытой очереди."""
+        self.__on_done = callback
+
+    def wait_space(self, timeout=None):
+        """Блокирует поток, пока очередь приостановлена."""
+        with self.__cond:
+            return self.__cond.wait_for(lambda: not self.__paused or self.__done, timeout)
+
+
+class LineSplitter(object):
+    """
+    Делит поток байтов на строки, незавершенная строка хранится до следующего фрагмента.
+    С encoding строки декодируются, как при чтении из канала в текстовом режиме.
+    """
+
+    def __init__(self, encoding=None):
+        self.encoding = encoding
+        self.__tail = b''
+
+    def __lines(self, lines):
+        if self.encoding:
+            return [line.rstrip().decode(self.encoding, 'replace') for line in lines]
+
+        return [line.rstrip() for line in lines]
+
+    def feed(self, chunk):
+        """Возвращает строки, завершенные во фрагменте chunk, без завершающих пробельных символов."""
+        lines = (self.__tail + chunk).split(b'\n')
+        self.__tail = lines.pop()
+
+        return self.__lines(lines)
+
+    def flush(self):
+        """Возвращает незавершенную строку в конце потока."""
+        tail, self.__tail = self.__tail, b''
+        return self.__lines([tail]) if tail else []
+
+
+class Reactor(object):
+    """
+    Один поток, читающий каналы всех процессов по мере готовности.
+    Каналы добавляются и удаляются из любого потока, изменения применяет поток Reactor.
+    В Windows selectors не работает с каналами, поэтому там каждый канал читается в своем потоке.
+    """
+
+    __default = None
+    __default_lock = Lock()
+
+    def __init__(self):
+        self.__lock = Lock()
+        self.__changes = deque()
+        self.__streams = {}
+        self.__paused = {}
+        self.__thread = None
+        self.__selector = None
+        self.__wakeup = None
+
+    def __apply(self):
+        """Применяет изменения, запрошенные другими потоками."""
+        with self.__lock:
+            changes, self.__changes = self.__changes, deque()
+
+        for action, fd, data in changes:
+            if action == 'add':
+                self.__streams[fd] = data
+                self.__selector.register(fd, selectors.EVENT_READ, data)
+            elif action == 'resume':
+                data = self.__paused.pop(fd, None)
+
+                if data is not None:
+                    self.__selector.register(fd, selectors.EVENT_READ, data)
+            else:
+                for fd, item in list(self.__streams.items()):
+                    if item[0] is data:
+                        self.__finish(fd)
+
+    def __finish(self, fd):
+        """Закрывает канал: оставшиеся строки передаются в очередь, и она закрывается."""
+        stream, queue, splitter, _ = self.__streams.pop(fd)
+
+        if self.__paused.pop(fd, None) is None:
+            self.__selector.unregister(fd)
+
+        if queue is not None:
+            queue.put(splitter.flush())
+            queue.close()
+
+        stream.close()
+
+    def __loop(self):
+        while True:
+            for key, _ in self.__selector.select():
+                if key.fd == self.__wakeup[0]:
+                    os.read(key.fd, CHUNK_SIZE)
+                    self.__apply()
+                    continue
+
+                if key.fd not in self.__streams:
+                    continue
+
+                stream, queue, splitter, capture = key.data
+                chunk = read_chunk(stream)
+
+                if not chunk:
+                    self.__finish(key.fd)
+                    continue
+
+                if capture is not None:
+                    capture.write(chunk)
+
+                if queue is not None and not queue.put(splitter.feed(chunk)):
+                    # Обработчик не успевает: процесс подождет, пока в очереди не освободится место.
+                    self.__selector.unregister(key.fd)
+                    self.__paused[key.fd] = key.data
+
+    def __notify(self, action, fd, data=None):
+        with self.__lock:
+            self.__changes.append((action, fd, data))
+
+            if self.__thread is None:
+                self.__selector = selectors.DefaultSelector()
+                self.__wakeup = os.pipe()
+                os.set_blocking(self.__wakeup[1], False)
+                self.__selector.register(self.__wakeup[0], selectors.EVENT_READ)
+
+                self.__thread = Thread(target=self.__loop, daemon=True)
+                self.__thread.start()
+
+        try:
+            os.write(self.__wakeup[1], b'\0')
+        except BlockingIOError:
+            # Канал пробуждения заполнен, поток и так проснется.
+            pass
+
+    @staticmethod
+    def __read_blocking(stream, queue, splitter, capture):
+        try:
+            while True:
+                chunk = read_chunk(stream)
+
+                if not chunk:
+                    break
+
+                if capture is not None:
+                    capture.write(chunk)
+
+                if queue is not None and not queue.put(splitter.feed(chunk)):
+                    queue.wait_space()
+
+            if queue is not None:
+                queue.put(splitter.flush())
+        finally:
+            if queue is not None:
+                queue.close()
+
+    def add(self, stream, queue=None, capture=None):
+        """
+        Начинает читать stream: строки передаются в очередь HandlerQueue,
+        а прочитанные байты записываются в capture (screen_god.capture.RingBuffer).
+        """
+        # Канал, открытый в текстовом режиме, читается в байтах, а строки декодируются.
+        splitter = LineSplitter(getattr(stream, 'encoding', None))
+
+        if os.name == 'nt':
+            Thread(target=self.__read_blocking, args=(stream, queue, splitter, capture), daemon=True).start()
+            return
+
+        fd = stream.fileno()
+
+        if queue is not None:
+            queue.set_on_drain(lambda: self.__notify('resume', fd))
+
+        self.__notify('add', fd, (stream, queue, splitter, capture))
+
+    @classmethod
+    def default(cls):
+        """Общий поток ввода-вывода процесса."""
+        with cls.__default_lock:
+            if cls.__default is None:
+                cls.__default = cls()
+
+            return cls.__default
+
+    def remove(self, stream):
+        """Прекращает чтение stream и закрывает его, прочитанные строки передаются обработчику."""
+        if self.__thread is not None:
+            self.__notify('remove', None, stream)
+
+    def streams(self):
+        """Количество читаемых каналов."""
+        return len(self.__streams)
@@ -18,8 +18,11 @@ setup(
     license='Apache License 2.0',
     author='Kirill Vercetti',
     author_email='office@kyzima-spb.com',
-    packages=['screen_god'],
+    packages=['screen_god', 'screen_god.composite', 'screen_god.manager'],
     install_requires=requires,
+    extras_require={
+        'xlib': ['python-xlib>=0.20'],
+    },
     scripts=[],
     py_modules=[],
 )
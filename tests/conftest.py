@@ -0,0 +1,17 @@
+# -*- coding: utf-8 -*-
+
+import pytest
+
+from screen_god.manager import set_backend
+from screen_god.manager.MemoryWindowManager import MemoryWindowManager
+
+
+@pytest.fixture
+def memory_manager():
+    """Делает MemoryWindowManager текущим менеджером окон на время теста."""
+    manager = MemoryWindowManager()
+    set_backend(manager)
+
+    yield manager
+
+    set_backend(None)
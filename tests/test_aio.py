@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+import subprocess
+import sys
+
+import psutil
+
+from screen_god import aio
+from screen_god.aio import AsyncWindowManager
+from screen_god.capture import RingBuffer
+from screen_god.manager.MemoryWindowManager import MemoryWindowManager
+
+
+def test_popen_many_finds_window():
+    manager = AsyncWindowManager(MemoryWindowManager())
+
+    async def main():
+        results = await manager.popen_many([([sys.executable, '-c', 'import time; time.sleep(30)'], {})], 5)
+
+        for hwnd, proc in results:
+            proc.kill()
+            await proc.wait()
+
+        return results
+
+    (hwnd, proc), = asyncio.run(main())
+
+    assert hwnd is not None and proc is not None
+
+
+def test_popen_many_failure_terminates_started():
+    manager = AsyncWindowManager(MemoryWindowManager())
+
+    async def main():
+        commands = [([sys.executable, '-c', 'import time; time.sleep(30)'], {}), (['/nonexistent/screen-god'], {})]
+
+        try:
+            await manager.popen_many(commands, 1)
+        except OSError:
+            pass
+        else:
+            raise AssertionError('popen_many() did not fail')
+
+    before = {p.pid for p in psutil.Process().children()}
+    asyncio.run(main())
+    started = [p for p in psutil.Process().children() if p.pid not in before]
+
+    assert all(p.status() == psutil.STATUS_ZOMBIE for p in started if p.is_running())
+
+
+class Collector(object):
+    def __init__(self):
+        self.lines = []
+
+    def execute(self, line):
+        self.lines.append(line)
+
+
+def test_reader_passes_long_lines_to_queue():
+    launcher = aio.LauncherItem(cmd=[sys.executable])
+    handler, capture = Collector(), RingBuffer(1024)
+    queue = launcher.queue(handler)
+    code = 'print("x" * 200000); print("end")'
+
+    async def main():
+        proc = await asyncio.create_subprocess_exec(sys.executable, '-c', code, stdout=subprocess.PIPE)
+        await asyncio.wait_for(launcher.reader(proc.stdout, queue, capture), 5)
+        await proc.wait()
+
+    asyncio.run(main())
+
+    # Строка длиннее предела StreamReader.readline() (64 КиБ) не обрывает чтение.
+    assert queue.join(5)
+    assert handler.lines == [b'x' * 200000, b'end']
+    assert capture.getvalue().endswith(b'end\n')
+    assert launcher.output_metrics().snapshot()['counters']['lines'] == 2
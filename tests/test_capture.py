@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import time
+
+import psutil
+
+from screen_god.capture import RingBuffer, SpillSegments
+from screen_god.composite import LauncherItem
+
+
+def test_ring_buffer_keeps_last_bytes():
+    ring = RingBuffer(16)
+
+    for i in range(10):
+        ring.write(b'line%d\n' % i)
+
+    assert ring.getvalue() == b'ne7\nline8\nline9\n'
+    assert ring.tail(2) == [b'line8', b'line9']
+    assert ring.size() == ring.capacity() == 16
+    assert ring.written() == 60
+
+
+def test_ring_buffer_write_larger_than_capacity():
+    ring = RingBuffer(8)
+    ring.write(b'0123456789abcdef')
+
+    assert ring.getvalue() == b'89abcdef'
+
+
+def test_ring_buffer_decodes_lines():
+    ring = RingBuffer(64, encoding='utf-8')
+    ring.write('привет\nмир'.encode('utf-8'))
+
+    assert ring.tail(5) == ['привет', 'мир']
+
+
+def test_spill_rotates_segments(tmp_path):
+    spill = SpillSegments(str(tmp_path), segment_size=64, count=3)
+    ring = RingBuffer(32, spill)
+
+    for i in range(100):
+        ring.write(b'line %03d\n' % i)
+
+    assert len(os.listdir(tmp_path)) == 3
+    assert ring.tail(12) == [b'line %03d' % i for i in range(88, 100)]
+
+    ring.close()
+    assert os.listdir(tmp_path) == []
+
+
+def test_launcher_capture_without_handlers(memory_manager, tmp_path):
+    code = 'import sys\nfor i in range(20000): print("out", i)\nprint("err", file=sys.stderr)'
+    launcher = LauncherItem(cmd=[sys.executable, '-c', code], capture=4096,
+                            spill={'directory': str(tmp_path), 'segment_size': 8192, 'count': 2})
+
+    cmd, kwargs = launcher.command()
+    launcher.attach(None, psutil.Popen(cmd, **kwargs))
+    launcher.process().wait(10)
+
+    deadline = time.monotonic() + 5
+
+    while launcher.tail(1) != [b'out 19999'] and time.monotonic() < deadline:
+        time.sleep(0.02)
+
+    try:
+        assert launcher.tail(3) == [b'out 19997', b'out 19998', b'out 19999']
+        assert launcher.tail(1, 'stderr') == [b'err']
+        assert launcher.capture().size() <= 4096
+        assert len(os.listdir(tmp_path)) <= 2
+    finally:
+        launcher.close()
@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+
+import sys
+import threading
+from threading import Event
+
+from screen_god.common import HelperProcess
+
+
+def test_helper_processes_share_reader_thread():
+    threads = threading.active_count()
+    lines = []
+    exited = []
+    done = Event()
+
+    def on_exit():
+        exited.append(1)
+
+        if len(exited) == 20:
+            done.set()
+
+    for i in range(20):
+        HelperProcess([sys.executable, '-c', 'print("line", %d)' % i], lines.append, on_exit)
+
+    assert done.wait(10)
+    assert sorted(lines) == sorted('line %d' % i for i in range(20))
+    # Поток ввода-вывода и диспетчер, а не поток на каждый процесс.
+    assert threading.active_count() - threads <= 2
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+
+import time
+
+from screen_god.composite import Enforcer, Item, Layout
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+
+        time.sleep(0.02)
+
+    return False
+
+
+def test_enforcer_survives_backend_errors(memory_manager, monkeypatch):
+    hwnd = memory_manager.create_window()
+    layout = Layout(Layout.HORIZONTAL, 800, 600, 0, 0)
+    layout.append(Item(hwnd))
+
+    move_changed = memory_manager.move_changed
+    failures = []
+
+    def flaky_move_changed(geometry, tolerance=0):
+        if not failures:
+            failures.append(1)
+            raise RuntimeError('backend failure')
+
+        return move_changed(geometry, tolerance)
+
+    monkeypatch.setattr(memory_manager, 'move_changed', flaky_move_changed)
+
+    enforcer = Enforcer(layout, interval=0.05, debounce=0.01)
+    enforcer.start(idle_timeout=0.05)
+
+    try:
+        assert wait_for(lambda: memory_manager.geometry(hwnd)['width'] == 800)
+        assert enforcer.is_alive()
+        assert memory_manager.metrics().snapshot()['counters']['enforce_errors'] == 1
+    finally:
+        enforcer.stop()
@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+
+import pytest
+
+from screen_god.composite import Layout
+from screen_god.composite.engine import grid, split
+from screen_god.composite.items import Item
+
+
+def nested_cells(rect, rows, columns):
+    """Ячейки той же сетки, рассчитанные вертикальным слоем из горизонтальных слоев."""
+    x, y, width, height = rect
+    root = Layout(Layout.VERTICAL, width, height, x, y)
+    cells = []
+
+    for row_size in rows:
+        row = Layout(Layout.HORIZONTAL, size=row_size)
+        root.append(row)
+
+        for column_size in columns:
+            item = Item(size=column_size)
+            row.append(item)
+            cells.append(item)
+
+    return [item.rect() for item in cells]
+
+
+@pytest.mark.parametrize('rows, columns', [
+    ([1, 1, 1], [1, 2, 1]),
+    (['100px', 1, '25%'], [3, '33%', 1, '10px']),
+    ([1] * 7, [1] * 13),
+])
+def test_grid_matches_nested_layouts(rows, columns):
+    rect = (5, 10, 1921, 1079)
+    assert grid(rect, rows, columns) == nested_cells(rect, rows, columns)
+
+
+def test_split_with_gap():
+    assert split(3, 320, 10, gap=10) == ([10, 120, 230], [100, 100, 100])
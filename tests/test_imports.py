@@ -0,0 +1,13 @@
+# -*- coding: utf-8 -*-
+
+import subprocess
+import sys
+
+
+def test_import_is_light():
+    """Импорт пакета не загружает необязательные и платформенные зависимости."""
+    code = 'import sys, screen_god; print(" ".join(sorted(sys.modules)))'
+    modules = subprocess.check_output([sys.executable, '-c', code], text=True).split()
+    heavy = {'numpy', 'Xlib', 'win32gui', 'asyncio', 'tomllib'}
+
+    assert not heavy.intersection(name.split('.')[0] for name in modules)
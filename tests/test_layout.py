@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+
+import pytest
+
+from screen_god.composite import Layout
+from screen_god.composite.items import Item
+
+
+def make_layout(count):
+    layout = Layout(Layout.HORIZONTAL, 1000, 100, 0, 0)
+    items = [Item() for _ in range(count)]
+
+    for item in items:
+        layout.append(item)
+
+    return layout, items
+
+
+def test_insert_keeps_original_semantics():
+    layout, (a, b) = make_layout(2)
+    before, after = Item(), Item()
+
+    layout.insert_after(before, b)
+    layout.insert_before(after, a)
+
+    assert list(layout) == [a, after, before, b]
+
+
+def test_positions_follow_inserts_and_removes():
+    layout, items = make_layout(5)
+
+    layout.remove(items[1])
+    layout.insert_after(items[1], items[4])
+
+    order = list(layout)
+
+    assert order == [items[0], items[2], items[3], items[1], items[4]]
+    assert [layout.index(item) for item in order] == list(range(5))
+    assert [item.prev() for item in order] == [None] + order[:-1]
+    assert [item.next() for item in order] == order[1:] + [None]
+    assert items[1].position() == 3
+
+
+def test_index_of_foreign_item():
+    layout, _ = make_layout(1)
+
+    with pytest.raises(ValueError):
+        layout.index(Item())
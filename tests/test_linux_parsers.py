@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+
+from screen_god.manager.LinuxWindowManager import parse_xprop, parse_xwininfo_tree
+
+
+def test_parse_xprop():
+    output = '\n'.join([
+        '_NET_FRAME_EXTENTS(CARDINAL) = 1, 1, 24, 1',
+        '_NET_WM_STATE(ATOM) = _NET_WM_STATE_MAXIMIZED_VERT, _NET_WM_STATE_MAXIMIZED_HORZ',
+    ])
+
+    assert parse_xprop(output) == {
+        '_NET_FRAME_EXTENTS': ['1', '1', '24', '1'],
+        '_NET_WM_STATE': ['_NET_WM_STATE_MAXIMIZED_VERT', '_NET_WM_STATE_MAXIMIZED_HORZ'],
+    }
+
+
+def test_parse_xprop_missing_and_empty():
+    output = '\n'.join([
+        '_NET_FRAME_EXTENTS:  not found.',
+        '_NET_WM_STATE(ATOM) = ',
+    ])
+
+    assert parse_xprop(output) == {'_NET_FRAME_EXTENTS': None, '_NET_WM_STATE': []}
+
+
+def test_parse_xwininfo_tree():
+    output = '\n'.join([
+        'xwininfo: Window id: 0x1e1 (the root window) (has no name)',
+        '',
+        '  Root window id: 0x1e1 (the root window) (has no name)',
+        '  Parent window id: 0x0 (none)',
+        '     2 children:',
+        '     0x1a00007 (has no name): ()  1282x745+100+50  +100+50',
+        '        1 child:',
+        '        0x3a00004 "Терминал": ("xterm" "XTerm")  1280x720+1+24  +101+74',
+        '     0x1c00001 "negative": ("app" "App")  640x480+-10+-20  +-10+-20',
+    ])
+
+    assert parse_xwininfo_tree(output) == {
+        0x1a00007: (100, 50, 1282, 745),
+        0x3a00004: (101, 74, 1280, 720),
+        0x1c00001: (-10, -20, 640, 480),
+    }
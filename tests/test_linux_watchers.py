@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+
+from threading import Thread
+
+import pytest
+
+from screen_god.manager import LinuxWindowManager as linux
+from screen_god.manager.LinuxWindowManager import LinuxWindowManager
+
+
+XPROP_OUTPUT = '_NET_FRAME_EXTENTS(CARDINAL) = 1, 2, 30, 4\n_NET_WM_STATE(ATOM) = _NET_WM_STATE_MAXIMIZED_VERT\n'
+
+
+class FakeHelper(object):
+    """xprop -spy: в отдельном потоке сообщает текущие значения свойств."""
+
+    def __init__(self, args, on_line, on_exit=None):
+        self.args = args
+        self.alive = True
+
+        def report():
+            for line in XPROP_OUTPUT.splitlines():
+                on_line(line)
+
+        Thread(target=report, daemon=True).start()
+
+    def close(self):
+        self.alive = False
+
+    def is_alive(self):
+        return self.alive
+
+
+@pytest.fixture
+def commands(monkeypatch):
+    commands, helpers = [], []
+
+    def run_command(cmd, timeout=None):
+        commands.append(cmd)
+        return XPROP_OUTPUT, '', 0
+
+    def helper(*args, **kwargs):
+        helpers.append(FakeHelper(*args, **kwargs))
+        return helpers[-1]
+
+    monkeypatch.setattr(linux, 'run_command', run_command)
+    monkeypatch.setattr(linux, 'HelperProcess', helper)
+
+    return commands, helpers
+
+
+def test_watcher_reports_current_values(commands):
+    commands, helpers = commands
+    manager = LinuxWindowManager()
+
+    assert manager.borders(0x400001) == {'left': 1, 'right': 2, 'top': 30, 'bottom': 4}
+    assert manager.is_maximized(0x400001)
+    assert manager.borders('0x400001')['top'] == 30
+
+    # Один процесс xprop -spy на окно и ни одного разового xprop.
+    assert len(helpers) == 1 and commands == []
+
+
+def test_watchers_are_limited(commands):
+    commands, helpers = commands
+    manager = LinuxWindowManager()
+    manager.max_watchers = 1
+
+    manager.borders(0x400001)
+    assert manager.borders(0x600001)['top'] == 30
+    assert manager.borders(0x600001)['top'] == 30
+
+    # Без наблюдателя значения не кэшируются.
+    assert len(helpers) == 1 and len(commands) == 2
+
+
+def test_failed_watcher_is_not_cached(commands, monkeypatch):
+    commands, helpers = commands
+
+    def fail(*args, **kwargs):
+        raise OSError('xprop')
+
+    monkeypatch.setattr(linux, 'HelperProcess', fail)
+    manager = LinuxWindowManager()
+
+    assert manager.borders(0x400001)['left'] == 1
+    assert manager.is_maximized(0x400001)
+    assert len(commands) == 2
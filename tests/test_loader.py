@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+
+import json
+import os
+import sys
+
+import pytest
+
+from screen_god.composite import loader
+from screen_god.composite.loader import Workspace, compile_plan, load, restore
+from screen_god.manager import NoSuchWindowException
+
+
+SLEEP = [sys.executable, '-c', 'import time; time.sleep(30)']
+
+
+def test_workspace_execute_all_places_windows(memory_manager):
+    workspace = Workspace([
+        {'cmd': SLEEP, 'rect': [0, 0, 960, 1080]},
+        {'cmd': SLEEP, 'rect': [960, 0, 960, 1080]},
+    ])
+
+    try:
+        workspace.execute_all(timeout=5)
+
+        for item in workspace.items():
+            assert memory_manager.geometry(item.hwnd())['left'] == item.rect()[0]
+    finally:
+        workspace.close()
+
+
+def test_workspace_execute_all_without_windows(memory_manager):
+    memory_manager.auto_map = False
+    workspace = Workspace([{'cmd': SLEEP, 'rect': [0, 0, 960, 1080]}])
+
+    try:
+        with pytest.raises(NoSuchWindowException):
+            workspace.execute_all(timeout=0.5)
+
+        launcher, = workspace.items()
+        assert launcher.hwnd() is None and launcher.process() is not None
+    finally:
+        workspace.close()
+
+
+SPEC = {
+    'direction': 'vertical', 'width': 1000, 'height': 600,
+    'items': [
+        {'direction': 'horizontal', 'items': [{'cmd': ['a']}, {'cmd': ['b'], 'size': '30%'}]},
+        {'window': 'Firefox', 'size': 2},
+    ],
+}
+
+TOML = """
+direction = "vertical"
+width = 1000
+height = 600
+
+[[items]]
+direction = "horizontal"
+items = [{cmd = ["a"]}, {cmd = ["b"], size = "30%"}]
+
+[[items]]
+window = "Firefox"
+size = 2
+"""
+
+LAUNCHERS = {'direction': 'horizontal', 'items': [{'cmd': SLEEP}, {'cmd': SLEEP}]}
+
+
+def write_layout(tmp_path, spec=LAUNCHERS):
+    path = tmp_path / 'layout.json'
+    path.write_text(json.dumps(spec))
+    return str(path)
+
+
+def test_load_json_and_toml(tmp_path):
+    (tmp_path / 'layout.json').write_text(json.dumps(SPEC))
+    (tmp_path / 'layout.toml').write_text(TOML)
+
+    assert load(str(tmp_path / 'layout.json')) == SPEC
+    assert load(str(tmp_path / 'layout.toml')) == SPEC
+
+    with pytest.raises(ValueError):
+        load(str(tmp_path / 'layout.yaml'), b'')
+
+
+def test_compile_plan():
+    assert compile_plan(SPEC, x=10, y=20) == [
+        {'cmd': ['a'], 'rect': [10, 20, 700, 200]},
+        {'cmd': ['b'], 'rect': [710, 20, 300, 200]},
+        {'window': 'Firefox', 'rect': [10, 220, 1000, 400]},
+    ]
+
+
+def test_cache_key_depends_on_file_and_screen(tmp_path):
+    cache = tmp_path / 'cache'
+    path = write_layout(tmp_path)
+
+    restore(path, 1920, 1080, cache=str(cache))
+    restore(path, 1920, 1080, cache=str(cache))
+    assert len(os.listdir(cache)) == 1
+
+    restore(path, 1280, 1024, cache=str(cache))
+    assert len(os.listdir(cache)) == 2
+
+    write_layout(tmp_path, dict(LAUNCHERS, direction='vertical'))
+    restore(path, 1920, 1080, cache=str(cache))
+    assert len(os.listdir(cache)) == 3
+
+
+def test_cache_hit_skips_parsing_and_solving(tmp_path, monkeypatch):
+    cache, path = str(tmp_path / 'cache'), write_layout(tmp_path)
+    expected = [item.rect() for item in restore(path, 1920, 1080, cache=cache).items()]
+
+    def fail(*args, **kwargs):
+        raise AssertionError('cache miss')
+
+    monkeypatch.setattr(loader, 'load', fail)
+    monkeypatch.setattr(loader, 'compile_plan', fail)
+
+    assert [item.rect() for item in restore(path, 1920, 1080, cache=cache).items()] == expected
+
+
+def test_unwritable_cache_falls_back(tmp_path):
+    # Каталог кэша нельзя создать: на его месте файл.
+    cache = tmp_path / 'cache'
+    cache.write_text('')
+
+    workspace = restore(write_layout(tmp_path), 1920, 1080, cache=str(cache))
+    assert [item.rect() for item in workspace.items()] == [(0, 0, 960, 1080), (960, 0, 960, 1080)]
+
+
+def test_failed_cache_write_removes_temp_file(tmp_path, monkeypatch):
+    cache = tmp_path / 'cache'
+    plan = [{'rect': [0, 0, 100, 100], 'note': object()}]
+    monkeypatch.setattr(loader, 'compile_plan', lambda *args: plan)
+
+    workspace = restore(write_layout(tmp_path), 1920, 1080, cache=str(cache))
+
+    assert len(workspace.items()) == 1
+    assert os.listdir(cache) == []
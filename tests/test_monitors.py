@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+
+import pytest
+
+from screen_god.composite import Item, Layout
+from screen_god.manager.LinuxWindowManager import parse_xrandr_monitors
+from screen_god.manager.monitors import Monitor, clip, find_monitor
+
+
+def test_parse_xrandr_monitors():
+    output = '\n'.join([
+        'Monitors: 2',
+        ' 0: +*eDP-1 1920/344x1080/194+0+0  eDP-1',
+        ' 1: +HDMI-1 2560/597x1440/336+1920+-360  HDMI-1',
+    ])
+
+    assert parse_xrandr_monitors(output) == [
+        ('eDP-1', 0, 0, 1920, 1080, True),
+        ('HDMI-1', 1920, -360, 2560, 1440, False),
+    ]
+
+
+def test_find_monitor():
+    monitors = [Monitor('a', 0, 0, 100, 100), Monitor('b', 100, 0, 100, 100, primary=True)]
+
+    assert find_monitor(monitors).name == 'b'
+    assert find_monitor(monitors, 'a').name == 'a'
+
+    with pytest.raises(LookupError):
+        find_monitor(monitors, 'c')
+
+
+def test_workarea_is_clipped_to_monitor():
+    monitor = Monitor('a', 1920, 0, 1920, 1080, workarea=(0, 24, 3840, 1056))
+    assert monitor.workarea == clip(monitor.rect, (0, 24, 3840, 1056)) == (1920, 24, 1920, 1056)
+
+
+def test_layout_follows_monitor_hotplug(memory_manager):
+    layout = Layout(Layout.HORIZONTAL)
+    item = Item(memory_manager.create_window())
+    layout.append(item)
+    memory_manager.set_monitors([Monitor('left', 0, 0, 1920, 1080), Monitor('right', 1920, 0, 1280, 1024)])
+    layout.bind_monitor('right', workarea=False)
+    layout.plan()
+    assert item.rect() == (1920, 0, 1280, 1024)
+
+    memory_manager.set_monitors([Monitor('right', 0, 0, 2560, 1440)])
+    layout.plan()
+    assert item.rect() == (0, 0, 2560, 1440)
@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+
+import os
+import threading
+
+import pytest
+
+from screen_god.output import BLOCK, DROP_NEW, DROP_OLD, Dispatcher, HandlerQueue, LineSplitter, Reactor
+
+
+class Collector(object):
+    def __init__(self):
+        self.lines = []
+
+    def execute(self, line):
+        self.lines.append(line)
+
+
+class ManualDispatcher(object):
+    """Диспетчер, который запускает очереди только по команде теста."""
+
+    def __init__(self):
+        self.queues = []
+
+    def run_all(self):
+        while self.queues:
+            queue = self.queues.pop(0)
+
+            if queue.run():
+                self.queues.append(queue)
+
+    def schedule(self, queue):
+        self.queues.append(queue)
+
+
+def make_queue(overflow, maxsize=3):
+    handler, dispatcher = Collector(), ManualDispatcher()
+    return HandlerQueue(handler, maxsize, overflow, dispatcher=dispatcher), handler, dispatcher
+
+
+def test_drop_new_keeps_oldest_lines():
+    queue, handler, dispatcher = make_queue(DROP_NEW)
+
+    assert queue.put(['a', 'b'])
+    assert queue.put(['c', 'd', 'e'])
+    dispatcher.run_all()
+
+    assert handler.lines == ['a', 'b', 'c']
+    assert queue.metrics().snapshot()['counters']['dropped'] == 2
+
+
+def test_drop_old_keeps_newest_lines():
+    queue, handler, dispatcher = make_queue(DROP_OLD)
+
+    queue.put(['a', 'b'])
+    queue.put(['c', 'd', 'e'])
+    dispatcher.run_all()
+
+    assert handler.lines == ['c', 'd', 'e']
+    assert queue.metrics().snapshot()['counters']['dropped'] == 2
+
+
+def test_block_pauses_until_drained():
+    queue, handler, dispatcher = make_queue(BLOCK)
+    drained = []
+    queue.set_on_drain(lambda: drained.append(True))
+
+    assert queue.put(['a', 'b'])
+    assert not queue.put(['c', 'd'])
+    assert queue.qsize() == 4
+
+    dispatcher.run_all()
+
+    assert handler.lines == ['a', 'b', 'c', 'd']
+    assert drained == [True]
+    assert queue.put(['e'])
+
+
+def test_close_waits_for_remaining_lines():
+    queue, handler, dispatcher = make_queue(BLOCK)
+    done = []
+    queue.set_on_done(lambda: done.append(True))
+
+    queue.put(['a'])
+    queue.close()
+    assert not queue.join(0)
+
+    dispatcher.run_all()
+
+    assert queue.join(0) and handler.lines == ['a'] and done == [True]
+
+
+def test_handler_errors_are_counted():
+    class Failing(object):
+        def execute(self, line):
+            raise ValueError(line)
+
+    dispatcher = ManualDispatcher()
+    queue = HandlerQueue(Failing(), dispatcher=dispatcher)
+    queue.put(['a'])
+    dispatcher.run_all()
+
+    assert queue.metrics().snapshot()['counters']['errors'] == 1
+
+
+def test_invalid_overflow():
+    with pytest.raises(ValueError):
+        HandlerQueue(Collector(), overflow='wait')
+
+
+class Slow(object):
+    def __init__(self):
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def execute(self, line):
+        self.started.set()
+        self.release.wait(5)
+
+
+def test_slow_handler_does_not_delay_other_queues():
+    dispatcher = Dispatcher(max_workers=4)
+    slow, fast = Slow(), Collector()
+
+    slow_queue = HandlerQueue(slow, dispatcher=dispatcher)
+    fast_queue = HandlerQueue(fast, dispatcher=dispatcher)
+
+    try:
+        slow_queue.put(['a'])
+        assert slow.started.wait(5)
+
+        fast_queue.put(['b', 'c'])
+        fast_queue.close()
+
+        assert fast_queue.join(5)
+        assert fast.lines == ['b', 'c']
+    finally:
+        slow.release.set()
+
+    slow_queue.close()
+    assert slow_queue.join(5)
+    assert dispatcher.workers() <= 2
+
+
+def test_queue_is_served_by_one_worker_at_a_time():
+    class Counting(object):
+        def __init__(self):
+            self.active = 0
+            self.most = 0
+            self.lines = []
+            self.lock = threading.Lock()
+
+        def execute(self, line):
+            with self.lock:
+                self.active += 1
+                self.most = max(self.most, self.active)
+
+            self.lines.append(line)
+
+            with self.lock:
+                self.active -= 1
+
+    handler = Counting()
+    queue = HandlerQueue(handler, dispatcher=Dispatcher(max_workers=8))
+
+    for i in range(200):
+        queue.put([i])
+
+    queue.close()
+
+    assert queue.join(5)
+    assert handler.lines == list(range(200))
+    assert handler.most == 1
+
+
+def test_internal_dispatcher_is_separate():
+    assert Dispatcher.internal() is Dispatcher.internal()
+    assert Dispatcher.internal() is not Dispatcher.default()
+
+
+def test_line_splitter():
+    splitter = LineSplitter('utf-8')
+
+    assert splitter.feed(b'one\ntw') == ['one']
+    assert splitter.feed('о\r\nтри'.encode('utf-8')) == ['twо']
+    assert splitter.flush() == ['три']
+
+@pytest.mark.skipif(os.name == 'nt', reason='selectors does not work with pipes on Windows')
+def test_reactor_reads_many_pipes_in_one_thread():
+    reactor = Reactor()
+    queues, handlers = [], []
+
+    for i in range(20):
+        read, write = os.pipe()
+        os.write(write, b''.join(b'%d:%d\n' % (i, n) for n in range(100)))
+        os.close(write)
+
+        handler = Collector()
+        queue = HandlerQueue(handler)
+        reactor.add(os.fdopen(read, 'rb'), queue)
+
+        queues.append(queue)
+        handlers.append(handler)
+
+    assert all(queue.join(5) for queue in queues)
+
+    for i, handler in enumerate(handlers):
+        assert handler.lines == [b'%d:%d' % (i, n) for n in range(100)]
+
+    assert reactor.streams() == 0
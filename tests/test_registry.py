@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+
+import gc
+
+from screen_god.composite import InstanceRegistry
+
+
+class Thing(object):
+    pass
+
+
+def test_lru_eviction():
+    registry = InstanceRegistry(maxsize=2)
+    a, b, c = Thing(), Thing(), Thing()
+
+    registry.put('a', a)
+    registry.put('b', b)
+    assert registry.get('a') is a
+
+    registry.put('c', c)
+
+    assert 'b' not in registry
+    assert registry.get('a') is a and registry.get('c') is c
+    assert registry.metrics().snapshot()['counters']['evicted'] == 1
+
+
+def test_get_or_create_counts_hits():
+    registry = InstanceRegistry()
+    first = registry.get_or_create('x', Thing)
+
+    assert registry.get_or_create('x', Thing) is first
+    counters = registry.metrics().snapshot()['counters']
+    assert counters['hits'] == 1 and counters['misses'] == 1
+
+
+def test_weak_entries_are_collected():
+    registry = InstanceRegistry(weak=True)
+    registry.put('x', Thing())
+    gc.collect()
+
+    assert 'x' not in registry and len(registry) == 0
+    assert registry.get_or_create('x', Thing) is not None
+
+
+def test_release():
+    registry = InstanceRegistry()
+    thing = registry.get_or_create('x', Thing)
+
+    assert registry.release('x') is thing
+    assert registry.release('x') is None
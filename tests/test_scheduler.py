@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+
+import pytest
+
+from screen_god.manager import MoveScheduler
+from screen_god.manager.MemoryWindowManager import MemoryWindowManager
+
+
+def test_requests_are_coalesced():
+    manager = MemoryWindowManager()
+    hwnd = manager.create_window()
+    scheduler = MoveScheduler(manager, fps=None, idle=0.05)
+
+    for width in range(100, 200):
+        future = scheduler.submit([(hwnd, 0, 0, width, 300)])
+
+    try:
+        assert future.result(5) == 1
+        assert manager.geometry(hwnd)['width'] == 199
+        assert manager.metrics().snapshot()['counters']['moves_coalesced'] == 99
+    finally:
+        scheduler.close()
+
+
+def test_failed_batch_does_not_stop_scheduler(monkeypatch):
+    manager = MemoryWindowManager()
+    hwnd = manager.create_window()
+    scheduler = MoveScheduler(manager, fps=None, idle=0.01)
+    move_changed = manager.move_changed
+    calls = []
+
+    def flaky_move_changed(geometry, tolerance=0):
+        calls.append(1)
+
+        if len(calls) == 1:
+            raise RuntimeError('backend failure')
+
+        return move_changed(geometry, tolerance)
+
+    monkeypatch.setattr(manager, 'move_changed', flaky_move_changed)
+
+    try:
+        with pytest.raises(RuntimeError):
+            scheduler.submit([(hwnd, 0, 0, 500, 300)]).result(5)
+
+        scheduler.submit([(hwnd, 0, 0, 600, 300)]).cancel()
+
+        assert scheduler.submit([(hwnd, 0, 0, 700, 300)]).result(5) == 1
+        assert manager.geometry(hwnd)['width'] == 700
+    finally:
+        scheduler.close()
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+
+import random
+
+from screen_god.composite import GridLayout, Item, Layout
+from screen_god.composite.solver import solve
+
+
+SIZES = [1, 2, 3, '10%', '25%', '50px', '120px']
+
+
+def build_tree(rng, depth=3):
+    root = Layout(Layout.VERTICAL, 1917, 1053, 3, 7)
+    stack = [(root, depth)]
+
+    while stack:
+        layout, level = stack.pop()
+
+        for _ in range(rng.randint(1, 5)):
+            if level and rng.random() < 0.4:
+                child = Layout(rng.choice([Layout.HORIZONTAL, Layout.VERTICAL]), size=rng.choice(SIZES))
+                stack.append((child, level - 1))
+            else:
+                child = Item(size=rng.choice(SIZES))
+
+            layout.append(child)
+
+    return root
+
+
+def all_items(root):
+    items, stack = [], [root]
+
+    while stack:
+        for item in stack.pop():
+            items.append(item)
+
+            if isinstance(item, Layout):
+                stack.append(item)
+
+    return items
+
+
+def mutate(rng, root):
+    layouts = [item for item in all_items(root) if isinstance(item, Layout)] + [root]
+    layout = rng.choice(layouts)
+    action = rng.choice(['resize', 'insert', 'remove', 'root'])
+
+    if action == 'resize' and len(layout):
+        rng.choice(list(layout)).set_size(rng.choice(SIZES))
+    elif action == 'insert' and len(layout):
+        layout.insert_before(Item(size=rng.choice(SIZES)), rng.choice(list(layout)))
+    elif action == 'remove' and len(layout) > 1:
+        layout.remove(rng.choice(list(layout)))
+    else:
+        root.set_width(rng.randint(800, 3000))
+
+
+def test_update_matches_full_solve():
+    rng = random.Random(13)
+
+    for _ in range(30):
+        root = build_tree(rng)
+        root.solve()
+
+        for _ in range(10):
+            mutate(rng, root)
+            root.update()
+
+            updated = {id(item): item.geometry() for item in all_items(root)}
+            expected = {id(item): rect for item, rect in solve(root, root.geometry())}
+
+            assert updated == expected
+
+
+def test_grid_layout_matches_solve():
+    grid = GridLayout(columns=[1, '30%', '100px'], gap=4, width=1280, height=720, x=0, y=0)
+
+    for _ in range(7):
+        grid.append(Item())
+
+    assert [item.rect() for item in grid] == [rect for _, rect in grid.solve()]
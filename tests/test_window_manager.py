@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+
+import sys
+
+import pytest
+
+from screen_god.manager.MemoryWindowManager import MemoryWindowManager
+
+
+SLEEP = [sys.executable, '-c', 'import time; time.sleep(30)']
+
+
+def test_popen_attempts_positional():
+    manager = MemoryWindowManager()
+
+    with pytest.warns(DeprecationWarning):
+        hwnd, proc = manager.Popen(SLEEP, 4)
+
+    try:
+        assert manager.get_pid_by_hwnd(hwnd) == proc.pid
+    finally:
+        proc.kill()
+
+
+def test_popen_timeout_keyword_only():
+    manager = MemoryWindowManager()
+    hwnd, proc = manager.Popen(SLEEP, timeout=2)
+
+    try:
+        assert manager.get_pid_by_hwnd(hwnd) == proc.pid
+    finally:
+        proc.kill()
+
+
+def test_popen_many_failure_terminates_started(monkeypatch):
+    import psutil
+
+    started = []
+    popen = psutil.Popen
+
+    def tracking_popen(*args, **kwargs):
+        proc = popen(*args, **kwargs)
+        started.append(proc)
+        return proc
+
+    monkeypatch.setattr(psutil, 'Popen', tracking_popen)
+    manager = MemoryWindowManager()
+
+    with pytest.raises(OSError):
+        manager.Popen_many([(SLEEP, {}), (['/nonexistent/screen-god-command'], {})], timeout=1)
+
+    assert len(started) == 1
+    assert not started[0].is_running() or started[0].status() == psutil.STATUS_ZOMBIE
+
+
+def test_move_changed_skips_windows_in_place():
+    manager = MemoryWindowManager()
+    hwnds = [manager.create_window() for _ in range(3)]
+    plan = [(hwnd, i * 100, 0, 100, 200) for i, hwnd in enumerate(hwnds)]
+
+    assert manager.move_changed(plan) == 0
+    assert manager.move_changed(plan) == 3
+    assert manager.move_changed([(hwnds[0], 1, 0, 100, 200)], tolerance=1) == 1
+
+
+def test_move_changed_empty_plan(monkeypatch):
+    manager = MemoryWindowManager()
+
+    def fail(hwnds):
+        raise AssertionError('geometry_many() called for an empty plan')
+
+    monkeypatch.setattr(manager, 'geometry_many', fail)
+
+    assert manager.move_changed([]) == 0
+    assert manager.move_changed(iter([])) == 0
@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+
+import struct
+
+import pytest
+
+pytest.importorskip('Xlib')
+
+from Xlib import X, Xatom
+from Xlib.protocol import event, request
+
+from screen_god.manager import XlibWindowManager as xlib_module
+from screen_god.manager.XlibWindowManager import (
+    XlibWindowManager,
+    client_message_data,
+    frame_extents,
+    property_value,
+    window_title,
+)
+
+
+def parse_property_reply(fmt, data=b'', length=0, prop_type=Xatom.CARDINAL, bytes_after=0):
+    """Разбирает ответ X-сервера на GetProperty так же, как это делает python-xlib."""
+    header = struct.pack('=BBHLLLL12x', 1, fmt, 1, (len(data) + 3) // 4, prop_type, bytes_after, length)
+    reply, _ = request.GetProperty._reply.parse_binary(header + data + b'\0' * (-len(data) % 4), None)
+    return reply
+
+
+def get_property_reply(fmt, data=b'', length=0):
+    return parse_property_reply(fmt, data, length).value
+
+
+class FakeReply(object):
+    def __init__(self, reply):
+        self.property_type = reply.property_type
+        self.bytes_after = reply.bytes_after
+        self.format, self.value = reply.value
+
+
+class FakeWindow(object):
+    """Окно с 32-битными свойствами {atom: (type, values)}, GetProperty отвечает как X-сервер."""
+
+    def __init__(self, wid, properties=None):
+        self.id = wid
+        self.properties = properties or {}
+
+    def change_attributes(self, **kwargs):
+        pass
+
+    def get_full_property(self, atom, prop_type, sizehint=10):
+        if atom not in self.properties:
+            return None
+
+        actual, values = self.properties[atom]
+        data = struct.pack('=%dL' % len(values), *values)
+
+        # При несовпадении типа сервер сообщает настоящий тип, но не отдает данные.
+        if prop_type not in (actual, X.AnyPropertyType):
+            reply = parse_property_reply(32, prop_type=actual, bytes_after=len(data))
+        else:
+            reply = parse_property_reply(32, data, len(values), actual)
+
+        # Как Drawable.get_property: свойства нет, если тип нулевой.
+        return FakeReply(reply) if reply.property_type else None
+
+
+class FakeScreen(object):
+    def __init__(self, root):
+        self.root = root
+
+
+class FakeDisplay(object):
+    def __init__(self, root):
+        self.root = root
+        self.atoms = {}
+
+    def create_resource_object(self, kind, wid):
+        return self.root if wid == self.root.id else FakeWindow(wid)
+
+    def flush(self):
+        pass
+
+    def intern_atom(self, name):
+        return self.atoms.setdefault(name, 1000 + len(self.atoms))
+
+    def query_extension(self, name):
+        return None
+
+    def screen(self):
+        return FakeScreen(self.root)
+
+
+@pytest.fixture
+def fake_display(monkeypatch):
+    display = FakeDisplay(FakeWindow(1))
+    monkeypatch.setattr(xlib_module, 'Display', lambda name=None: display)
+    return display
+
+
+def test_frame_extents_from_reply():
+    value = get_property_reply(32, struct.pack('=4L', 1, 2, 24, 3), 4)
+    assert frame_extents(property_value(value)) == {'left': 1, 'right': 2, 'top': 24, 'bottom': 3}
+
+
+def test_frame_extents_missing_property():
+    value = get_property_reply(0)
+
+    assert value is None
+    assert frame_extents(property_value(value)) == {'left': 0, 'right': 0, 'top': 0, 'bottom': 0}
+
+
+def test_state_from_reply():
+    value = get_property_reply(32, struct.pack('=2L', 301, 302), 2)
+    assert frozenset(property_value(value)) == {301, 302}
+
+
+def test_state_missing_property():
+    assert frozenset(property_value(get_property_reply(0))) == frozenset()
+
+
+def test_pid_from_reply():
+    assert property_value(get_property_reply(32, struct.pack('=L', 4242), 1)) == [4242]
+
+
+def test_title_from_reply():
+    net_wm_name = get_property_reply(8, 'Терминал'.encode('utf-8'), len('Терминал'.encode('utf-8')))
+    wm_name = get_property_reply(8, b'Terminal', 8)
+
+    assert window_title([property_value(net_wm_name), property_value(wm_name)]) == 'Терминал'
+    assert window_title([property_value(get_property_reply(0)), property_value(wm_name)]) == 'Terminal'
+    assert window_title([None, []]) is None
+
+
+def test_fake_window_mismatched_type_is_empty():
+    root = FakeWindow(1, {5: (Xatom.WINDOW, [0x400001])})
+
+    assert list(root.get_full_property(5, Xatom.CARDINAL).value) == []
+    assert list(root.get_full_property(5, X.AnyPropertyType).value) == [0x400001]
+
+
+def test_get_opened_reads_window_typed_client_list(fake_display):
+    manager = XlibWindowManager()
+    atom = fake_display.intern_atom('_NET_CLIENT_LIST')
+    fake_display.root.properties[atom] = (Xatom.WINDOW, [0x400001, 0x600003])
+
+    assert manager.get_opened() == [0x400001, 0x600003]
+
+
+def test_get_opened_without_client_list(fake_display):
+    assert XlibWindowManager().get_opened() == []
+
+
+def test_client_message_negative_origin():
+    data = client_message_data([1 << 8, -1920, -24, 800, 600])
+    ev = event.ClientMessage(window=0x400001, client_type=300, data=(32, data))
+
+    # Данные события - 20 байтов после заголовка (код, формат, номер, окно, тип).
+    assert list(struct.unpack('=5l', ev._binary[12:32])) == [1 << 8, -1920, -24, 800, 600]
+
+
+def test_client_message_data_pads_to_five():
+    assert client_message_data([2, 1]) == [2, 1, 0, 0, 0]